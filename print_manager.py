@@ -1,6 +1,29 @@
 import os
+import sys
+import time
 import warnings
 
+# --- STARTUP PROFILER (python print_manager.py --startup-profile) ---
+class StartupProfiler:
+    def __init__(self, enabled):
+        self.enabled = enabled; self.t0 = self.last = time.perf_counter()
+        self.phases = []; self.lazy = []
+
+    def mark(self, label):
+        now = time.perf_counter(); self.phases.append((label, now - self.last)); self.last = now
+
+    def record_lazy(self, label, seconds): self.lazy.append((label, seconds))
+
+    def report(self):
+        if not self.enabled: return
+        total = time.perf_counter() - self.t0
+        print(f"\n{'STARTUP PROFILE':<44}{'ms':>10}")
+        for label, dt in self.phases: print(f"  {label:<42}{dt * 1000:>10.1f}")
+        for label, dt in self.lazy: print(f"  (lazy) {label:<35}{dt * 1000:>10.1f}")
+        print(f"  {'TOTAL (time to first window)':<42}{total * 1000:>10.1f}")
+
+STARTUP = StartupProfiler("--startup-profile" in sys.argv)
+
 # --- SUPPRESS WARNINGS & CONFIG ENV ---
 os.environ["QT_API"] = "pyqt5"
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -10,43 +33,71 @@ import tkinter as tk
 from tkinter import messagebox, filedialog, simpledialog, Menu
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
+from ttkbootstrap.tooltip import ToolTip
+STARTUP.mark("import tkinter + ttkbootstrap")
 import json
-import sys
 import shutil
 import glob
 import webbrowser
 import ctypes.wintypes
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+from collections import OrderedDict
 from PIL import Image, ImageTk, ImageDraw
+STARTUP.mark("import PIL")
 import zipfile
+import gzip
+import pickle
+import zlib
+import hashlib
+import atexit
+import sqlite3
 import urllib.request
 import re
 import threading
-import time
+import queue
 import uuid
 import ssl
+import socket
+import select
+import mmap
+import random
 import csv
 import math 
+import bisect
+from array import array
+import importlib
+import importlib.util
+STARTUP.mark("import stdlib")
 
 # --- OPTIONAL DEPENDENCIES ---
-try:
-    import paho.mqtt.client as mqtt
-    HAS_MQTT = True
-except ImportError:
-    HAS_MQTT = False
-
-try:
-    import matplotlib.pyplot as plt
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    HAS_MATPLOTLIB = True
-except ImportError:
-    HAS_MATPLOTLIB = False
-
-try:
-    import google.generativeai as genai
-    HAS_GENAI = True
-except ImportError:
-    HAS_GENAI = False
+# Probed with find_spec (no import); the heavy modules load on first attribute access.
+def has_module(name):
+    try: return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError): return False
+
+class LazyModule:
+    def __init__(self, name): self._name = name; self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            t = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            STARTUP.record_lazy(f"import {self._name}", time.perf_counter() - t)
+        return getattr(self._module, attr)
+
+HAS_MQTT = has_module("paho.mqtt")
+HAS_MATPLOTLIB = has_module("matplotlib")
+HAS_GENAI = has_module("google.generativeai")
+HAS_NUMPY = has_module("numpy")
+HAS_ORJSON = has_module("orjson")
+np = LazyModule("numpy")
+mqtt = LazyModule("paho.mqtt.client")
+mpl_figure = LazyModule("matplotlib.figure")
+mpl_tkagg = LazyModule("matplotlib.backends.backend_tkagg")
+genai = LazyModule("google.generativeai")
+orjson = LazyModule("orjson")
+STARTUP.mark("optional dependency probes")
 
 try:
     import ctypes
@@ -85,12 +136,1557 @@ def resource_path(relative_path):
     except Exception: base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
+# ======================================================
+# WRITE-BEHIND PERSISTENCE
+# ======================================================
+def atomic_write_json(path, data, indent=None):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(data if isinstance(data, str) else json.dumps(data, indent=indent)); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class WriteBehindWriter:
+    # Coalesces dirty marks per path into one atomic write per debounce window, off the Tk thread.
+    def __init__(self, debounce=0.75):
+        self.debounce = debounce
+        self.pending = {} # path -> [snapshot_fn, indent, due, seq]
+        self.seq = 0; self.written = {} # Mark counter; path -> seq of the newest snapshot written (or being retried)
+        self.cond = threading.Condition(); self.io_lock = threading.Lock()
+        self.thread = None; self.stopped = False; self.last_error = None
+        self.failed = {}; self.new_errors = {} # path -> error while its saves keep failing; first failures not yet shown
+        self.listeners = [] # Called as fn(path) from the writer thread after each successful write
+        self.stats = {"marks": 0, "writes": 0, "coalesced": 0, "errors": 0}
+
+    def mark_dirty(self, path, snapshot, indent=4):
+        with self.cond:
+            self.stats['marks'] += 1; self.seq += 1
+            if path in self.pending: self.pending[path][0] = snapshot; self.pending[path][3] = self.seq; self.stats['coalesced'] += 1
+            else: self.pending[path] = [snapshot, indent, time.monotonic() + self.debounce, self.seq]
+            if self.thread is None and not self.stopped:
+                self.thread = threading.Thread(target=self._run, name="WriteBehind", daemon=True); self.thread.start()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.stopped: return
+                    now = time.monotonic()
+                    due = [p for p, (_, _, t, _) in self.pending.items() if t <= now]
+                    if due: break
+                    next_due = min((t for _, _, t, _ in self.pending.values()), default=None)
+                    self.cond.wait(None if next_due is None else next_due - now)
+                batch = [(p, self.pending.pop(p)) for p in due]
+            for path, (snapshot, indent, _, seq) in batch: self._write(path, snapshot, indent, seq)
+
+    def _write(self, path, snapshot, indent, seq):
+        with self.io_lock:
+            # A flush() can overtake a batch the worker already popped; never let the older snapshot land last
+            if seq < self.written.get(path, 0): return
+            self.written[path] = seq
+            for _ in range(3):
+                # The Tk thread may mutate the data mid-encode; retry, the next mark re-queues anyway
+                try: payload = json.dumps(snapshot(), indent=indent, default=record_json_default); break
+                except RuntimeError: continue
+            else: payload = None
+            try:
+                if payload is None: raise RuntimeError(f"data kept changing while saving {os.path.basename(path)}")
+                atomic_write_json(path, payload); self.stats['writes'] += 1
+                with self.cond: self.failed.pop(path, None)
+                for fn in self.listeners: fn(path)
+            except Exception as e:
+                self.last_error = e; self.stats['errors'] += 1
+                with self.cond:
+                    if path not in self.failed: self.new_errors[path] = e # Background retries don't report again
+                    self.failed[path] = e
+                    if not self.stopped and path not in self.pending: self.pending[path] = [snapshot, indent, time.monotonic() + self.debounce * 4, seq]; self.cond.notify()
+
+    def flush(self):
+        # -> {path: error} for files that still could not be saved
+        with self.cond: batch = list(self.pending.items()); self.pending.clear()
+        for path, (snapshot, indent, _, seq) in batch: self._write(path, snapshot, indent, seq)
+        with self.cond: return dict(self.failed)
+
+    def take_errors(self):
+        # First failure of each path since the last call; polled from the Tk thread
+        with self.cond: errors, self.new_errors = self.new_errors, {}
+        return errors
+
+    def close(self):
+        self.flush()
+        with self.cond: self.stopped = True; self.cond.notify()
+
+WRITER = WriteBehindWriter()
+atexit.register(WRITER.close)
+
+# ======================================================
+# BACKGROUND TASKS
+# ======================================================
+# One bounded pool for every slow job (AI calls, profile scans, backups, exports,
+# image decode). Workers never touch Tk: results, errors and progress go onto a
+# queue that a single root.after poller drains and dispatches on the main thread.
+# Submitting a key that is already queued or running hands back the in-flight task.
+class TaskCancelled(Exception): pass
+
+_task_local = threading.local()
+def current_task(): return getattr(_task_local, "task", None) # The Task the calling worker is running, if any
+
+class Task:
+    __slots__ = ("runner", "key", "fn", "args", "on_done", "on_error", "on_progress", "timeout", "deadline", "cancelled", "timed_out")
+    def __init__(self, runner, key, fn, args, on_done, on_error, on_progress, timeout):
+        self.runner = runner; self.key = key; self.fn = fn; self.args = args
+        self.on_done = on_done; self.on_error = on_error; self.on_progress = on_progress
+        self.timeout = timeout; self.deadline = None; self.cancelled = False; self.timed_out = False
+
+    def cancel(self): self.cancelled = True # Queued tasks are skipped; running ones stop at their next check()/progress()
+
+    def check(self):
+        if self.cancelled: raise TaskCancelled(self.key)
+
+    def progress(self, value=None, text=None):
+        self.check(); self.runner.results.put((self, "progress", (value, text)))
+
+class TaskRunner:
+    def __init__(self, workers=4):
+        self.size = workers; self.workers = []; self.idle = 0 # Free workers minus queued jobs; an abandoned (timed-out) task still holds its worker
+        self.jobs = queue.Queue(); self.results = queue.Queue()
+        self.lock = threading.Lock(); self.inflight = {}; self.active = set()
+        self.root = None; self.interval = 50; self.stopped = False
+
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None, on_progress=None, timeout=None):
+        # Callbacks run on the Tk thread: on_done(result), on_error(exc), on_progress(value, text)
+        with self.lock:
+            if self.stopped: return None
+            running = self.inflight.get(key) if key is not None else None
+            if running and not running.cancelled: return running
+            task = Task(self, key, fn, args, on_done, on_error, on_progress, timeout)
+            if key is not None: self.inflight[key] = task
+            self.active.add(task)
+            self.idle -= 1
+            if self.idle < 0 and len(self.workers) < self.size:
+                t = threading.Thread(target=self._work, name=f"Task-{len(self.workers)}", daemon=True); t.start(); self.workers.append(t); self.idle += 1
+            self.jobs.put(task)
+        return task
+
+    def _forget(self, task):
+        with self.lock:
+            self.active.discard(task)
+            if task.key is not None and self.inflight.get(task.key) is task: del self.inflight[task.key]
+
+    def _work(self):
+        while True:
+            task = self.jobs.get()
+            if task is None: return
+            if task.cancelled: self._forget(task)
+            else: self._run(task)
+            with self.lock: self.idle += 1
+
+    def _run(self, task):
+        if task.timeout: task.deadline = time.monotonic() + task.timeout
+        _task_local.task = task
+        try: res = ("done", task.fn(*task.args))
+        except TaskCancelled: res = None
+        except Exception as e: res = ("error", e)
+        finally: _task_local.task = None
+        self._forget(task)
+        if res and not task.cancelled: self.results.put((task, *res))
+
+    def attach(self, root, interval=50):
+        self.root = root; self.interval = interval; root.after(interval, self._poll)
+
+    def _poll(self):
+        try: self.drain()
+        finally:
+            if not self.stopped:
+                try: self.root.after(self.interval, self._poll)
+                except tk.TclError: pass # Root already destroyed
+
+    def drain(self):
+        # A thread can't be killed, so a timed-out task is abandoned: marked cancelled, its late result dropped
+        now = time.monotonic()
+        with self.lock: expired = [t for t in self.active if t.deadline and now >= t.deadline and not t.cancelled]
+        for t in expired:
+            t.timed_out = True; t.cancel(); self._forget(t)
+            self._dispatch(t.on_error, TimeoutError(f"Timed out after {t.timeout:g}s"))
+        while True:
+            try: task, kind, payload = self.results.get_nowait()
+            except queue.Empty: return
+            if task.cancelled: continue
+            if kind == "progress": self._dispatch(task.on_progress, *payload)
+            elif kind == "done": self._dispatch(task.on_done, payload)
+            else: self._dispatch(task.on_error, payload)
+
+    def _dispatch(self, fn, *args):
+        if fn is None: return
+        try: fn(*args)
+        except Exception as e: print(f"Task callback failed: {e!r}", file=sys.stderr)
+
+    def shutdown(self):
+        with self.lock:
+            self.stopped = True
+            for t in self.active: t.cancel()
+            self.active.clear(); self.inflight.clear()
+        for _ in self.workers: self.jobs.put(None)
+
+TASKS = TaskRunner()
+
+# ======================================================
+# CONFIG STORE
+# ======================================================
+class ConfigStore:
+    # config.json is parsed once per process; setters only queue a write when a value actually changes.
+    def __init__(self, path, writer):
+        self.path = path; self.writer = writer
+        self.data = None
+        self.lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self.data is None:
+            self.data = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f: self.data = json.load(f)
+                except: pass
+        return self.data
+
+    def get(self, key, default=None): return self._ensure_loaded().get(key, default)
+    def section(self, name): return dict(self._ensure_loaded().get(name) or {})
+
+    def set(self, key, value):
+        data = self._ensure_loaded()
+        if data.get(key) == value: return False
+        with self.lock: data[key] = value
+        self.writer.mark_dirty(self.path, self.snapshot, indent=None)
+        return True
+
+    def update(self, **values):
+        changed = [self.set(k, v) for k, v in values.items()]
+        return any(changed)
+
+    def snapshot(self):
+        # Shallow copy of the whole config; also what the writer encodes
+        with self.lock: return dict(self._ensure_loaded())
+
+    # --- TYPED SECTIONS ---
+    @property
+    def sticky_settings(self): return self.section('sticky_settings')
+    @property
+    def printer_cfg(self): return self.section('printer_cfg')
+    @property
+    def printers(self):
+        # The fleet list; configs from before it existed only have the single printer_cfg
+        fleet = self.get('printers')
+        if fleet is None:
+            cfg = self.printer_cfg
+            fleet = [{"name": "Printer", "model": "", "ip": cfg.get('ip', ''), "access_code": cfg.get('access_code', ''), "serial": cfg.get('serial', '')}] if cfg.get('access_code') else []
+        return [dict(p) for p in fleet]
+    @property
+    def gemini_api_key(self): return self.get('gemini_api_key', '')
+    @property
+    def gemini_model(self): return self.get('gemini_model', 'gemini-1.5-flash')
+    @property
+    def storage_backend(self): return self.get('storage_backend', 'json')
+
+CONFIG = ConfigStore(CONFIG_FILE, WRITER)
+
+# ======================================================
+# HISTORY JOURNAL (APPEND-ONLY)
+# ======================================================
+# sales_history.json is imported once, then every sale is a single NDJSON line.
+# Segments are single-year and sealed with a footer line; sealed segments from
+# past years are folded into archive/<year>.ndjson.gz (one gzip member each).
+HISTORY_JOURNAL_DIR = os.path.join(DATA_DIR, "sales_history.d")
+
+class HistoryJournal:
+    SEGMENT_LIMIT = 5000
+
+    def __init__(self, legacy_file, journal_dir):
+        self.legacy_file = legacy_file; self.dir = journal_dir
+        self.seg_dir = os.path.join(journal_dir, "segments"); self.archive_dir = os.path.join(journal_dir, "archive")
+        self.index_file = os.path.join(journal_dir, "index.json")
+        self.index = {"version": 1, "segments": [], "archives": {}, "active": None}
+        self.active_meta = None; self._fh = None; self._staged = None
+
+    # --- INDEX ---
+    def open(self):
+        os.makedirs(self.seg_dir, exist_ok=True); os.makedirs(self.archive_dir, exist_ok=True)
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f: self.index = json.load(f)
+            except: self.rebuild_index()
+        elif os.listdir(self.seg_dir): self.rebuild_index()
+        if self.index.get("import"): self._finish_import()
+        if not self.index.get("active"): self.index["active"] = self._next_segment_name(); self._save_index()
+        self._repair_active()
+        if os.path.exists(self.legacy_file): self._import_legacy()
+        self.compact()
+
+    def rebuild_index(self):
+        names = sorted(n for n in os.listdir(self.seg_dir) if n.endswith(".ndjson"))
+        archives = {}
+        for n in os.listdir(self.archive_dir):
+            if n.endswith(".ndjson.gz"): archives[n[:4]] = sum(1 for _ in self._read_lines(os.path.join(self.archive_dir, n), gz=True))
+        self.index = {"version": 1, "segments": [], "archives": archives, "active": None}
+        for n in names:
+            footer = self._read_footer(os.path.join(self.seg_dir, n))
+            if footer: self.index["segments"].append(dict(footer, name=n))
+            else: self.index["active"] = n
+        self._save_index()
+
+    def _save_index(self):
+        if self._staged is None: atomic_write_json(self.index_file, self.index)
+
+    def _path(self, name):
+        # While importing, writes go to <segment>.tmp copies; nothing is visible until the index commits them
+        path = os.path.join(self.seg_dir, name)
+        if self._staged is None: return path
+        if name not in self._staged:
+            self._staged.add(name)
+            if os.path.exists(path): shutil.copyfile(path, path + ".tmp")
+            else: open(path + ".tmp", 'w').close()
+        return path + ".tmp"
+
+    def _repair_active(self):
+        # A crash mid-append can leave the active segment without its final newline; the next append
+        # would then glue a good record onto the torn one. Cut the torn tail, or finish a whole last line.
+        path = os.path.join(self.seg_dir, self.index['active'])
+        if not os.path.exists(path): return
+        with open(path, 'rb+') as f:
+            f.seek(0, os.SEEK_END); size = f.tell(); end = pos = size
+            while pos > 0:
+                step = min(4096, pos); f.seek(pos - step); chunk = f.read(step); i = chunk.rfind(b"\n")
+                if i >= 0: end = pos - step + i + 1; break
+                pos -= step
+            else: end = 0
+            if end == size: return
+            f.seek(end); tail = f.read()
+            try: json.loads(tail); whole = True
+            except ValueError: whole = False
+            if whole: f.seek(size); f.write(b"\n")
+            else: f.truncate(end)
+
+    def _next_segment_name(self):
+        used = [int(s['name'].split('.')[0]) for s in self.index['segments']]
+        if self.index.get('active'): used.append(int(self.index['active'].split('.')[0]))
+        return f"{(max(used) + 1) if used else 1:06d}.ndjson"
+
+    # --- READ ---
+    def _read_lines(self, path, gz=False):
+        opener = gzip.open if gz else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip(): continue
+                try: rec = json.loads(line)
+                except ValueError: continue # Torn tail from a crash mid-append
+                if '__footer__' in rec or '__segment__' in rec: continue
+                yield rec
+
+    def _read_footer(self, path):
+        last = None
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END); size = f.tell(); f.seek(max(0, size - 512))
+            tail = f.read().splitlines()
+            if tail: last = tail[-1]
+        try: return json.loads(last).get('__footer__') if last else None
+        except: return None
+
+    def source_files(self): return [self.index_file, os.path.join(self.seg_dir, self.index['active'])]
+
+    def load(self):
+        self.close()
+        entries = []
+        for year in sorted(self.index['archives']):
+            path = os.path.join(self.archive_dir, f"{year}.ndjson.gz")
+            if os.path.exists(path): entries.extend(self._read_lines(path, gz=True))
+        for seg in self.index['segments']:
+            entries.extend(self._read_lines(os.path.join(self.seg_dir, seg['name'])))
+        active_path = os.path.join(self.seg_dir, self.index['active'])
+        active = list(self._read_lines(active_path)) if os.path.exists(active_path) else []
+        self.active_meta = {"count": len(active), "first": active[0].get('date', '') if active else None, "last": active[-1].get('date', '') if active else None}
+        entries.extend(active)
+        return entries
+
+    # --- WRITE ---
+    def append(self, entry):
+        if self.active_meta is None: self.load()
+        year = str(entry.get('date', ''))[:4]
+        first = self.active_meta['first']
+        if self.active_meta['count'] >= self.SEGMENT_LIMIT or (first is not None and first[:4] != year): self.seal()
+        if self._fh is None: self._fh = open(self._path(self.index['active']), 'a', encoding='utf-8')
+        self._fh.write(json.dumps(entry) + "\n"); self._fh.flush()
+        m = self.active_meta; m['count'] += 1; m['last'] = entry.get('date', '')
+        if m['first'] is None: m['first'] = m['last']
+
+    def seal(self):
+        m = self.active_meta
+        if not m or not m['count']: return
+        name = self.index['active']
+        if self._fh is None: self._fh = open(self._path(name), 'a', encoding='utf-8')
+        self._fh.write(json.dumps({"__footer__": {"count": m['count'], "first": m['first'], "last": m['last']}}) + "\n")
+        self.close()
+        self.index['segments'].append({"name": name, "count": m['count'], "first": m['first'], "last": m['last']})
+        self.index['active'] = self._next_segment_name()
+        self.active_meta = {"count": 0, "first": None, "last": None}
+        self._save_index(); self.compact()
+
+    def compact(self):
+        if self._staged is not None: return
+        this_year = datetime.now().strftime("%Y")
+        for seg in list(self.index['segments']):
+            year = str(seg.get('first') or '')[:4]
+            if not year or year >= this_year: continue
+            src = os.path.join(self.seg_dir, seg['name']); dst = os.path.join(self.archive_dir, f"{year}.ndjson.gz")
+            # Each member starts with a header so a crash before the index save can't archive a segment twice
+            if os.path.exists(src) and seg['name'] not in self._archived_segments(dst):
+                with open(src, 'rb') as f: raw = f.read()
+                with gzip.open(dst, 'ab') as gz: gz.write((json.dumps({"__segment__": seg['name']}) + "\n").encode('utf-8') + raw)
+            self.index['segments'].remove(seg)
+            self.index['archives'][year] = self.index['archives'].get(year, 0) + seg['count']
+            self._save_index()
+            if os.path.exists(src): os.remove(src)
+
+    def _archived_segments(self, path):
+        if not os.path.exists(path): return set()
+        names = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('{"__segment__"'): names.add(json.loads(line)['__segment__'])
+        return names
+
+    def _import_legacy(self):
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f: legacy = json.load(f)
+        except: legacy = []
+        # Staged, then committed by a single index save that lists the renames still to do. A crash before
+        # the save leaves the journal as it was and the import simply reruns; after it, open() finishes the job.
+        self.load(); saved = json.loads(json.dumps(self.index)); self._staged = set()
+        try:
+            for entry in legacy if isinstance(legacy, list) else []: self.append(entry)
+        except: self.index = saved; self.active_meta = None; raise
+        finally: self.close(); staged = sorted(self._staged); self._staged = None
+        self.index['import'] = staged; self._save_index()
+        self._finish_import()
+
+    def _finish_import(self):
+        for name in self.index.get('import', []):
+            path = os.path.join(self.seg_dir, name)
+            if os.path.exists(path + ".tmp"): os.replace(path + ".tmp", path)
+        if os.path.exists(self.legacy_file): os.replace(self.legacy_file, self.legacy_file + ".migrated")
+        self.index.pop('import', None); self._save_index()
+
+    def close(self):
+        if self._fh: self._fh.close(); self._fh = None
+
+# ======================================================
+# RECORDS
+# ======================================================
+# Inventory and history rows are parsed once at load into slotted records with
+# real numeric fields; unknown keys ride along in `extra` and round-trip to JSON.
+def normalize_spool_id(value):
+    sid = str(value).strip()
+    return sid.zfill(3) if sid.isdigit() else sid
+
+def to_number(value, default=0.0):
+    try: return float(str(value).replace("$", "").strip()) if value not in (None, "") else default
+    except (TypeError, ValueError): raise ValueError(f"not a number: {value!r}")
+
+def record_json_default(obj):
+    if hasattr(obj, 'to_dict'): return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+class Spool:
+    __slots__ = ("id", "name", "material", "color", "weight", "cost", "benchy", "benchy_nozzle", "ams_slot", "abrasive", "extra")
+
+    def __init__(self, id, name="", material="", color="", weight=0.0, cost=0.0, benchy="❌", benchy_nozzle="0.4mm", ams_slot="External", abrasive=False, extra=None):
+        self.id = normalize_spool_id(id); self.name = name; self.material = material; self.color = color
+        self.weight = weight; self.cost = cost; self.benchy = benchy; self.benchy_nozzle = benchy_nozzle
+        self.ams_slot = ams_slot; self.abrasive = abrasive; self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d, warnings=None):
+        def num(key):
+            try: return to_number(d.get(key))
+            except ValueError:
+                if warnings is not None: warnings.append(f"Spool {d.get('id', '?')}: invalid {key} {d.get(key)!r}, using 0")
+                return 0.0
+        abr = d.get('abrasive', False)
+        if not isinstance(abr, bool): abr = str(abr).strip().lower() in ("true", "yes", "1", "⚠️ abrasive")
+        extra = {k: v for k, v in d.items() if k not in cls.__slots__} or None
+        return cls(d.get('id', ''), str(d.get('name') or ''), str(d.get('material') or ''), str(d.get('color') or ''), num('weight'), num('cost'),
+                   d.get('benchy') or '❌', d.get('benchy_nozzle') or '0.4mm', d.get('ams_slot') or 'External', abr, extra)
+
+    def to_dict(self):
+        d = {"id": self.id, "name": self.name, "material": self.material, "color": self.color, "weight": self.weight, "cost": self.cost,
+             "benchy": self.benchy, "benchy_nozzle": self.benchy_nozzle, "ams_slot": self.ams_slot, "abrasive": self.abrasive}
+        if self.extra: d.update(self.extra)
+        return d
+
+    @property
+    def label(self): return f"[{self.id}] {self.name} - {self.material or '?'} - {self.color}"
+
+class HistoryEntry:
+    __slots__ = ("date", "job", "sold_for", "cost", "profit", "extra")
+
+    def __init__(self, date, job="", sold_for=0.0, cost=0.0, profit=0.0, extra=None):
+        self.date = date; self.job = job; self.sold_for = sold_for; self.cost = cost; self.profit = profit; self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d, warnings=None):
+        def num(key):
+            try: return to_number(d.get(key))
+            except ValueError:
+                if warnings is not None: warnings.append(f"History {d.get('date', '?')} {d.get('job', '')}: invalid {key} {d.get(key)!r}, using 0")
+                return 0.0
+        extra = {k: v for k, v in d.items() if k not in cls.__slots__} or None
+        return cls(str(d.get('date') or ''), str(d.get('job') or ''), num('sold_for'), num('cost'), num('profit'), extra)
+
+    def to_dict(self):
+        d = {"date": self.date, "job": self.job, "sold_for": self.sold_for, "profit": self.profit, "cost": self.cost}
+        if self.extra: d.update(self.extra)
+        return d
+
+    @property
+    def day(self): return self.date[:10]
+
+# ======================================================
+# ANALYTICS (COLUMNAR HISTORY)
+# ======================================================
+# Sales history as parallel NumPy arrays (day as datetime64[D], money as float64)
+# with amortized O(1) appends, so period group-bys are a unique + bincount.
+FAILED_PREFIX = "FAILED:"
+FAILURE_REASON_RE = re.compile(r"\(([^()]*)\)\s*$")
+ISO_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+REPORT_PERIODS = {"Daily": "D", "Weekly": "W", "Monthly": "M", "Yearly": "Y"}
+
+class HistoryColumns:
+    FIELDS = ("sold_for", "cost", "profit")
+
+    def __init__(self, capacity=1024):
+        self.n = 0; self.reasons = [""]; self.reason_codes = {"": 0}
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old = getattr(self, 'cols', None)
+        cols = {"day": np.empty(capacity, dtype="datetime64[D]"), "reason": np.zeros(capacity, dtype=np.int32), "failed": np.zeros(capacity, dtype=bool)}
+        for f in self.FIELDS: cols[f] = np.zeros(capacity, dtype=np.float64)
+        if old:
+            for k, arr in old.items(): cols[k][:self.n] = arr[:self.n]
+        self.cols = cols; self.capacity = capacity
+
+    @classmethod
+    def build(cls, history):
+        cols = cls(max(1024, len(history) * 2)); cols.extend(history); return cols
+
+    def _reason_code(self, job):
+        m = FAILURE_REASON_RE.search(job); reason = m.group(1).strip() if m else "Unspecified"
+        if reason not in self.reason_codes: self.reason_codes[reason] = len(self.reasons); self.reasons.append(reason)
+        return self.reason_codes[reason]
+
+    def extend(self, entries):
+        k = len(entries)
+        if not k: return
+        if self.n + k > self.capacity: self._alloc(max(self.capacity * 2, self.n + k))
+        sl = slice(self.n, self.n + k)
+        days = [h.day for h in entries]
+        try: self.cols['day'][sl] = np.array(days, dtype="datetime64[D]")
+        except ValueError:
+            # A malformed date shouldn't sink the whole batch; it becomes NaT and drops out of reports
+            self.cols['day'][sl] = np.array([d if ISO_DAY_RE.match(d) else "NaT" for d in days], dtype="datetime64[D]")
+        for f in self.FIELDS: self.cols[f][sl] = np.fromiter((getattr(h, f) for h in entries), dtype=np.float64, count=k)
+        failed = [h.job.startswith(FAILED_PREFIX) for h in entries]
+        self.cols['failed'][sl] = failed
+        self.cols['reason'][sl] = [self._reason_code(h.job) if f else 0 for h, f in zip(entries, failed)]
+        self.n += k
+
+    def append(self, entry): self.extend([entry])
+
+    def view(self, start=None, end=None):
+        v = {k: arr[:self.n] for k, arr in self.cols.items()}
+        mask = ~np.isnat(v['day'])
+        if start: mask &= v['day'] >= np.datetime64(start, 'D')
+        if end: mask &= v['day'] <= np.datetime64(end, 'D')
+        return {k: arr[mask] for k, arr in v.items()}
+
+    @staticmethod
+    def period_keys(days, period):
+        if period == "W": return days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]") # Monday of the ISO week
+        if period == "M": return days.astype("datetime64[M]")
+        if period == "Y": return days.astype("datetime64[Y]")
+        return days
+
+    def pnl(self, period="D", start=None, end=None):
+        v = self.view(start, end)
+        keys, inv = np.unique(self.period_keys(v['day'], period), return_inverse=True)
+        count = np.bincount(inv, minlength=len(keys))
+        revenue = np.bincount(inv, weights=v['sold_for'], minlength=len(keys))
+        cost = np.bincount(inv, weights=v['cost'], minlength=len(keys))
+        profit = np.bincount(inv, weights=v['profit'], minlength=len(keys))
+        failure_cost = np.bincount(inv, weights=np.where(v['failed'], v['cost'], 0.0), minlength=len(keys))
+        with np.errstate(divide='ignore', invalid='ignore'): margin = np.where(revenue > 0, profit / revenue * 100, 0.0)
+        return {"period": keys.astype(str), "count": count, "revenue": revenue, "cost": cost, "profit": profit, "margin": margin, "failure_cost": failure_cost}
+
+    def failures_by_reason(self, start=None, end=None):
+        v = self.view(start, end); codes = v['reason'][v['failed']]
+        count = np.bincount(codes, minlength=len(self.reasons))
+        cost = np.bincount(codes, weights=v['cost'][v['failed']], minlength=len(self.reasons))
+        order = np.argsort(-cost)
+        return [(self.reasons[i], int(count[i]), float(cost[i])) for i in order if count[i]]
+
+class DashboardRollups:
+    # Running totals behind the dashboard cards and revenue chart, updated in O(1) per mutation
+    # and persisted inside the warm-start snapshot so a cache hit never rescans history.
+    LOW_STOCK_G = 200
+
+    def __init__(self):
+        self.daily_revenue = {}; self.weekly_revenue = {}; self.monthly_revenue = {} # Keyed by day / Monday / YYYY-MM
+        self.history_count = 0; self.cost_sum = 0.0; self.revision = 0 # Bumped whenever revenue changes
+        self.spool_weights = {}; self.total_g = 0; self.low_stock = set()
+
+    @classmethod
+    def rebuild(cls, inventory, history):
+        r = cls()
+        for spool in inventory: r.set_spool(spool)
+        for entry in history: r.add_history(entry)
+        return r
+
+    def add_history(self, entry):
+        self.history_count += 1; self.cost_sum += entry.cost
+        day = entry.day; amount = entry.sold_for
+        self.daily_revenue[day] = self.daily_revenue.get(day, 0.0) + amount
+        try: d = datetime.fromisoformat(day).date()
+        except ValueError: pass
+        else:
+            week = (d - timedelta(days=d.weekday())).isoformat()
+            self.weekly_revenue[week] = self.weekly_revenue.get(week, 0.0) + amount
+            self.monthly_revenue[day[:7]] = self.monthly_revenue.get(day[:7], 0.0) + amount
+        self.revision += 1
+
+    def set_spool(self, spool):
+        grams = int(spool.weight)
+        self.total_g += grams - self.spool_weights.get(spool.id, 0); self.spool_weights[spool.id] = grams
+        if spool.weight < self.LOW_STOCK_G: self.low_stock.add(spool.id)
+        else: self.low_stock.discard(spool.id)
+
+    def remove_spool(self, spool_id):
+        self.total_g -= self.spool_weights.pop(spool_id, 0); self.low_stock.discard(spool_id)
+
+    def stats(self):
+        return {"projects": self.history_count, "avg_cost": self.cost_sum / self.history_count if self.history_count else 0,
+                "total_g": self.total_g, "low_count": len(self.low_stock)}
+
+    def revenue_series(self, days, today=None):
+        # Calendar window ending today, read straight from the buckets: daily up to a month, weekly up to a
+        # quarter, monthly beyond. Returns (labels, values).
+        today = today or datetime.now().date()
+        if days <= 31:
+            keys = [(today - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+            return [k[5:] for k in keys], [self.daily_revenue.get(k, 0.0) for k in keys]
+        if days <= 120:
+            monday = today - timedelta(days=today.weekday())
+            keys = [(monday - timedelta(weeks=i)).isoformat() for i in range(days // 7, -1, -1)]
+            return [k[5:] for k in keys], [self.weekly_revenue.get(k, 0.0) for k in keys]
+        months = [(today.year * 12 + today.month - 1) - i for i in range(days // 31, -1, -1)]
+        keys = [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in months]
+        return keys, [self.monthly_revenue.get(k, 0.0) for k in keys]
+
+class HistoryQuery:
+    # Filtered, sorted view over the history list kept as a compact index array; rows are fetched on demand by
+    # position so the UI never has to materialize the whole history.
+    SORT_KEYS = {"Date": lambda h: h.date, "Job": lambda h: h.job.lower(), "Cost": lambda h: h.cost,
+                 "Price": lambda h: h.sold_for, "Profit": lambda h: h.profit}
+
+    def __init__(self, history):
+        self.history = history; self.start = None; self.end = None; self.job = ""
+        self.sort = "Date"; self.descending = True; self.index = array("l")
+
+    def set_filter(self, start=None, end=None, job=""):
+        for d in (start, end):
+            if d and not ISO_DAY_RE.match(d): raise ValueError(d)
+        self.start = start or None; self.end = end or None; self.job = job.strip().lower()
+
+    def set_sort(self, column):
+        if column == self.sort: self.descending = not self.descending
+        else: self.sort = column; self.descending = column != "Job"
+
+    def refresh(self):
+        hist = self.history; start, end, job = self.start, self.end, self.job
+        if start or end or job:
+            rows = [i for i, h in enumerate(hist) if (not start or h.day >= start) and (not end or h.day <= end) and (not job or job in h.job.lower())]
+        else: rows = range(len(hist))
+        key = self.SORT_KEYS[self.sort]
+        if self.sort == "Date" and not (start or end or job): # Journal order is (almost always) date order; skip the sort when it is
+            ordered = all(hist[i - 1].date <= hist[i].date for i in range(1, len(hist)))
+            if ordered: self.index = array("l", reversed(rows) if self.descending else rows); return len(self.index)
+        self.index = array("l", sorted(rows, key=lambda i: key(hist[i]), reverse=self.descending))
+        return len(self.index)
+
+    def __len__(self): return len(self.index)
+
+    def __getitem__(self, pos): return self.history[self.index[pos]]
+
+# ======================================================
+# INVENTORY REPOSITORY
+# ======================================================
+def spool_sort_key(spool):
+    return int(spool.id) if spool.id.isdigit() else 9999
+
+class InventoryRepository:
+    # Sole owner of the spool records: id -> spool and the display order (spool_sort_key, then id) kept sorted
+    # by insertion instead of re-sorting on every save. Field lookups (material, AMS slot, type) go through SpoolSearchIndex.
+    def __init__(self, spools=()):
+        self.by_id = {}; self.spools = []; self._order = []
+        for spool in spools: self.put(spool)
+
+    def __iter__(self): return iter(self.spools)
+    def __len__(self): return len(self.spools)
+    def __contains__(self, spool_id): return spool_id in self.by_id
+    def get(self, spool_id): return self.by_id.get(spool_id)
+
+    @staticmethod
+    def _order_key(spool): return (spool_sort_key(spool), spool.id)
+
+    def put(self, spool):
+        # Insert or replace by id; returns the spool's position in display order
+        old = self.by_id.get(spool.id)
+        if old is spool: return self.position(spool.id)
+        if old is not None: self.remove(spool.id)
+        key = self._order_key(spool); pos = bisect.bisect_right(self._order, key)
+        self._order.insert(pos, key); self.spools.insert(pos, spool); self.by_id[spool.id] = spool
+        return pos
+
+    def remove(self, spool_id):
+        spool = self.by_id.pop(spool_id, None)
+        if spool is None: return None
+        pos = self.position(spool_id, spool)
+        del self._order[pos]; del self.spools[pos]
+        return spool
+
+    def position(self, spool_id, spool=None):
+        spool = spool or self.by_id[spool_id]
+        return bisect.bisect_left(self._order, self._order_key(spool))
+
+    def next_id(self):
+        # Display order sorts numeric ids numerically, so the last numeric one is the highest
+        for spool in reversed(self.spools):
+            if spool.id.isdigit(): return str(int(spool.id) + 1).zfill(3)
+        return "001"
+
+# ======================================================
+# INVENTORY SEARCH INDEX
+# ======================================================
+SEARCH_TERM_RE = re.compile(r"^(\w+)(<=|>=|<|>|=|:)(.+)$")
+SEARCH_TOKEN_RE = re.compile(r"[^\s,/()\[\]]+")
+SEARCH_FIELD_ALIASES = {"brand": "name", "mat": "material", "colour": "color", "slot": "ams", "ams_slot": "ams",
+                        "nozzle": "benchy_nozzle", "grams": "weight", "price": "cost"}
+
+class SpoolSearchIndex:
+    # Field-scoped token lists (sorted, for prefix lookups), a trigram index over all field text for free
+    # substring terms, and sorted numeric columns for range terms. Updated per spool, never rebuilt per keystroke.
+    # Query syntax: `material:petg color:bl weight<200 cost>=15 sunlu` (all terms must match).
+    TEXT_FIELDS = ("id", "name", "material", "color", "ams", "benchy", "benchy_nozzle", "type")
+    NUMERIC_FIELDS = ("weight", "cost")
+
+    def __init__(self, inventory=()):
+        self.docs = {} # spool id -> (text, {field: [tokens]}, {field: number})
+        self.postings = {f: {} for f in self.TEXT_FIELDS}; self.tokens = {f: [] for f in self.TEXT_FIELDS}
+        self.trigrams = {}
+        self.numbers = {f: ([], []) for f in self.NUMERIC_FIELDS} # field -> (sorted values, matching ids)
+        for spool in inventory: self.add(spool)
+
+    @staticmethod
+    def _fields(spool):
+        return {"id": spool.id, "name": spool.name, "material": spool.material, "color": spool.color, "ams": spool.ams_slot,
+                "benchy": spool.benchy, "benchy_nozzle": spool.benchy_nozzle, "type": "abrasive" if spool.abrasive else "standard"}
+
+    def add(self, spool):
+        if spool.id in self.docs: self.remove(spool.id)
+        fields = {f: str(v).lower() for f, v in self._fields(spool).items()}
+        text = " ".join(fields.values())
+        tokens = {f: set(SEARCH_TOKEN_RE.findall(v)) for f, v in fields.items()}
+        for f, toks in tokens.items():
+            for t in toks:
+                ids = self.postings[f].get(t)
+                if ids is None: ids = self.postings[f][t] = set(); bisect.insort(self.tokens[f], t)
+                ids.add(spool.id)
+        for g in {text[i:i + 3] for i in range(len(text) - 2)}: self.trigrams.setdefault(g, set()).add(spool.id)
+        numbers = {"weight": to_number(spool.weight), "cost": to_number(spool.cost)}
+        for f, v in numbers.items():
+            values, ids = self.numbers[f]; i = bisect.bisect_right(values, v)
+            values.insert(i, v); ids.insert(i, spool.id)
+        self.docs[spool.id] = (text, tokens, numbers)
+
+    def remove(self, spool_id):
+        doc = self.docs.pop(spool_id, None)
+        if not doc: return
+        text, tokens, numbers = doc
+        for f, toks in tokens.items():
+            for t in toks:
+                ids = self.postings[f][t]; ids.discard(spool_id)
+                if not ids: del self.postings[f][t]; del self.tokens[f][bisect.bisect_left(self.tokens[f], t)]
+        for g in {text[i:i + 3] for i in range(len(text) - 2)}:
+            ids = self.trigrams.get(g)
+            if ids is not None:
+                ids.discard(spool_id)
+                if not ids: del self.trigrams[g]
+        for f, v in numbers.items():
+            values, ids = self.numbers[f]; i = bisect.bisect_left(values, v)
+            while ids[i] != spool_id: i += 1
+            del values[i]; del ids[i]
+
+    def _prefix(self, field, prefix):
+        toks = self.tokens[field]; i = bisect.bisect_left(toks, prefix); out = set()
+        while i < len(toks) and toks[i].startswith(prefix): out |= self.postings[field][toks[i]]; i += 1
+        return out
+
+    def _range(self, field, op, value):
+        values, ids = self.numbers[field]
+        lo, hi = bisect.bisect_left(values, value), bisect.bisect_right(values, value)
+        return set({"<": ids[:lo], "<=": ids[:hi], ">": ids[hi:], ">=": ids[lo:], "=": ids[lo:hi], ":": ids[lo:hi]}[op])
+
+    def _substring(self, term, within):
+        if len(term) >= 3:
+            grams = sorted((self.trigrams.get(term[i:i + 3], set()) for i in range(len(term) - 2)), key=len)
+            within = within & grams[0] if within is not None else set(grams[0])
+        pool = within if within is not None else self.docs.keys()
+        return {sid for sid in pool if term in self.docs[sid][0]} # Trigram hits are candidates; confirm the real substring
+
+    def search(self, query):
+        # Returns the set of matching spool ids, or None when the query is empty (everything matches)
+        result = None; free = []
+        for term in query.lower().split():
+            m = SEARCH_TERM_RE.match(term)
+            field = SEARCH_FIELD_ALIASES.get(m.group(1), m.group(1)) if m else None
+            if field in self.NUMERIC_FIELDS:
+                try: ids = self._range(field, m.group(2), float(m.group(3)))
+                except ValueError: ids = set()
+            elif field in self.TEXT_FIELDS and m.group(2) in (":", "="):
+                value = m.group(3)
+                ids = set(self.postings[field].get(value, ())) if m.group(2) == "=" else self._prefix(field, value)
+            else: free.append(term); continue
+            result = ids if result is None else result & ids
+        # Free-text terms go last so short (< 3 char) ones only scan what the indexed terms left over
+        for term in sorted(free, key=len, reverse=True): result = self._substring(term, result)
+        return result
+
+# ======================================================
+# STORAGE BACKENDS
+# ======================================================
+# Both stores expose the same row-level mutation API. JsonStore still writes
+# whole files (batched per `with store.batch()`), SqliteStore touches one row.
+SQLITE_FILE = os.path.join(DATA_DIR, "print_shop.db")
+SPOOL_COLUMNS = ("id", "name", "material", "color", "weight", "cost", "benchy", "benchy_nozzle", "ams_slot", "abrasive")
+HISTORY_COLUMNS = ("date", "job", "sold_for", "cost", "profit")
+
+class JsonStore:
+    backend = "json"
+
+    def __init__(self, journal):
+        self.journal = journal; self.owner = None; self.on_written = None
+        self._batch_depth = 0; self._dirty = set()
+
+    def attach(self, owner): self.owner = owner
+    def source_files(self): return [DB_FILE, MAINT_FILE, QUEUE_FILE] + self.journal.source_files()
+
+    def load(self):
+        o = self.owner
+        return o.load_json(DB_FILE), self.journal.load(), o.load_json(MAINT_FILE), o.load_json(QUEUE_FILE)
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try: yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                for name in sorted(self._dirty): self._write(name)
+                self._dirty.clear()
+
+    def _touch(self, name):
+        if self._batch_depth: self._dirty.add(name)
+        else: self._write(name)
+
+    def _write(self, name):
+        o = self.owner
+        path, data = {"inventory": (DB_FILE, o.inventory.spools), "maintenance": (MAINT_FILE, o.maintenance), "queue": (QUEUE_FILE, o.queue)}[name]
+        o.save_json(data, path)
+
+    def upsert_spool(self, spool): self._touch("inventory")
+    def delete_spool(self, spool_id): self._touch("inventory")
+    def close(self): self.journal.close()
+    def append_history(self, entry):
+        self.journal.append(entry.to_dict())
+        if self.on_written: self.on_written(self.journal.source_files())
+    def update_maintenance(self, item): self._touch("maintenance")
+    def save_maintenance(self): self._touch("maintenance")
+    def save_queue(self): self._touch("queue")
+
+class SqliteStore:
+    backend = "sqlite"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS spools (id TEXT PRIMARY KEY, name TEXT, material TEXT, color TEXT, weight REAL, cost REAL,
+            benchy TEXT, benchy_nozzle TEXT, ams_slot TEXT, abrasive INTEGER, sort_key INTEGER, extra TEXT);
+        CREATE INDEX IF NOT EXISTS idx_spools_material ON spools(material);
+        CREATE INDEX IF NOT EXISTS idx_spools_ams ON spools(ams_slot);
+        CREATE INDEX IF NOT EXISTS idx_spools_weight ON spools(weight);
+        CREATE TABLE IF NOT EXISTS history (seq INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, job TEXT, sold_for REAL, cost REAL, profit REAL, extra TEXT);
+        CREATE INDEX IF NOT EXISTS idx_history_date ON history(date);
+        CREATE TABLE IF NOT EXISTS maintenance (task TEXT PRIMARY KEY, freq TEXT, last TEXT, position INTEGER, extra TEXT);
+        CREATE TABLE IF NOT EXISTS queue (position INTEGER PRIMARY KEY, data TEXT);
+    """
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path; self.owner = None; self.on_written = None; self._batch_depth = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL"); self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA); self.conn.commit()
+
+    def attach(self, owner): self.owner = owner
+    def source_files(self): return [self.path, self.path + "-wal"]
+    def close(self): self.conn.close()
+
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try: yield
+        except:
+            self._batch_depth -= 1
+            if not self._batch_depth: self.conn.rollback()
+            raise
+        else:
+            self._batch_depth -= 1
+            if not self._batch_depth: self._commit()
+
+    def _commit(self):
+        if self._batch_depth: return
+        self.conn.commit()
+        if self.on_written: self.on_written(self.source_files())
+
+    @staticmethod
+    def _split(record, columns):
+        extra = {k: v for k, v in record.items() if k not in columns}
+        return [record.get(c) for c in columns], (json.dumps(extra) if extra else None)
+
+    @staticmethod
+    def _join(row, columns, extra):
+        rec = {c: v for c, v in zip(columns, row) if v is not None}
+        if extra: rec.update(json.loads(extra))
+        return rec
+
+    # --- LOAD ---
+    def load(self):
+        inventory = []
+        for row in self.conn.execute(f"SELECT {', '.join(SPOOL_COLUMNS)}, extra FROM spools ORDER BY sort_key, rowid"):
+            rec = self._join(row[:-1], SPOOL_COLUMNS, row[-1])
+            if 'abrasive' in rec: rec['abrasive'] = bool(rec['abrasive'])
+            inventory.append(rec)
+        history = [self._join(row[:-1], HISTORY_COLUMNS, row[-1]) for row in self.conn.execute(f"SELECT {', '.join(HISTORY_COLUMNS)}, extra FROM history ORDER BY seq")]
+        maintenance = [self._join(row[:-1], ("task", "freq", "last"), row[-1]) for row in self.conn.execute("SELECT task, freq, last, extra FROM maintenance ORDER BY position")]
+        queue = [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM queue ORDER BY position")]
+        return inventory, history, maintenance, queue
+
+    # --- MUTATIONS ---
+    def upsert_spool(self, spool):
+        vals, extra = self._split(spool.to_dict(), SPOOL_COLUMNS)
+        self.conn.execute(f"INSERT OR REPLACE INTO spools ({', '.join(SPOOL_COLUMNS)}, sort_key, extra) VALUES ({', '.join('?' * len(SPOOL_COLUMNS))}, ?, ?)", vals + [spool_sort_key(spool), extra])
+        self._commit()
+
+    def delete_spool(self, spool_id):
+        self.conn.execute("DELETE FROM spools WHERE id = ?", (str(spool_id),)); self._commit()
+
+    def append_history(self, entry):
+        vals, extra = self._split(entry.to_dict(), HISTORY_COLUMNS)
+        self.conn.execute(f"INSERT INTO history ({', '.join(HISTORY_COLUMNS)}, extra) VALUES (?, ?, ?, ?, ?, ?)", vals + [extra]); self._commit()
+
+    def update_maintenance(self, item):
+        self.conn.execute("UPDATE maintenance SET freq = ?, last = ? WHERE task = ?", (item.get('freq'), item.get('last'), item['task'])); self._commit()
+
+    def save_maintenance(self):
+        with self.batch():
+            self.conn.execute("DELETE FROM maintenance")
+            for pos, item in enumerate(self.owner.maintenance):
+                vals, extra = self._split(item, ("task", "freq", "last"))
+                self.conn.execute("INSERT OR REPLACE INTO maintenance (task, freq, last, position, extra) VALUES (?, ?, ?, ?, ?)", vals + [pos, extra])
+
+    def save_queue(self):
+        with self.batch():
+            self.conn.execute("DELETE FROM queue")
+            self.conn.executemany("INSERT INTO queue (position, data) VALUES (?, ?)", [(pos, json.dumps(job, default=record_json_default)) for pos, job in enumerate(self.owner.queue)])
+
+    # --- MIGRATION ---
+    def import_json(self, inventory, history, maintenance, queue):
+        class _Owner: pass
+        self.owner = _Owner(); self.owner.maintenance = maintenance; self.owner.queue = queue
+        with self.batch():
+            for table in ("spools", "history"): self.conn.execute(f"DELETE FROM {table}")
+            for spool in inventory: self.upsert_spool(Spool.from_dict(spool))
+            for entry in history: self.append_history(HistoryEntry.from_dict(entry))
+            self.save_maintenance(); self.save_queue()
+
+def migrate_json_to_sqlite(db_path=SQLITE_FILE):
+    def read(path):
+        if not os.path.exists(path): return []
+        with open(path, 'r', encoding='utf-8') as f: return json.load(f)
+    journal = HistoryJournal(HISTORY_FILE, HISTORY_JOURNAL_DIR); journal.open()
+    inventory, history, maintenance, queue = read(DB_FILE), journal.load(), read(MAINT_FILE), read(QUEUE_FILE)
+    journal.close()
+    store = SqliteStore(db_path); store.import_json(inventory, history, maintenance, queue); store.conn.close()
+    CONFIG.set('storage_backend', "sqlite"); WRITER.flush()
+    return {"spools": len(inventory), "history": len(history), "maintenance": len(maintenance), "queue": len(queue)}
+
+def open_store(journal):
+    if CONFIG.storage_backend == "sqlite" and os.path.exists(SQLITE_FILE): return SqliteStore(SQLITE_FILE)
+    return JsonStore(journal)
+
+# ======================================================
+# WARM-START SNAPSHOT CACHE
+# ======================================================
+# A pickle of the parsed, normalized stores. The small header (backend + stat
+# signature of every source file) is unpickled first, so a stale cache is
+# rejected after a handful of os.stat calls without touching the payload.
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+SNAPSHOT_CACHE_FILE = os.path.join(CACHE_DIR, "data_snapshot.pickle")
+
+def file_stat(path):
+    try: st = os.stat(path); return (st.st_mtime_ns, st.st_size)
+    except OSError: return None
+
+def stat_signature(paths): return {p: file_stat(p) for p in paths}
+
+class SnapshotCache:
+    VERSION = 8
+
+    def __init__(self, path=SNAPSHOT_CACHE_FILE): self.path = path
+
+    def load(self, backend, signature):
+        try:
+            with open(self.path, 'rb') as f:
+                header = pickle.load(f)
+                if header != {"version": self.VERSION, "backend": backend, "signature": signature}: return None
+                return pickle.load(f)
+        except Exception: return None
+
+    def save(self, backend, signature, data):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({"version": self.VERSION, "backend": backend, "signature": signature}, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+# ======================================================
+# THUMBNAIL CACHE
+# ======================================================
+# Downscaled reference images as PNGs under .cache/thumbs, named by a hash of
+# (path, mtime, size) so an edited or replaced source simply misses the cache.
+THUMB_CACHE_DIR = os.path.join(CACHE_DIR, "thumbs")
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=THUMB_CACHE_DIR, box=(1000, 600)):
+        self.cache_dir = cache_dir; self.box = box
+
+    def path_for(self, src):
+        st = file_stat(src)
+        key = hashlib.sha1(f"{os.path.abspath(src)}|{st}|{self.box}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def load(self, src):
+        # Worker-thread safe: pure PIL/file I/O. Returns a fully decoded PIL image.
+        thumb = self.path_for(src)
+        try:
+            with Image.open(thumb) as im: im.load(); return im.copy()
+        except Exception: pass
+        with Image.open(src) as im:
+            im.draft("RGB", self.box) # Lets JPEG decode straight at a reduced scale
+            im.thumbnail(self.box); out = im.convert("RGBA") if im.mode not in ("RGB", "RGBA") else im.copy()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = thumb + f".{threading.get_ident()}.tmp"; out.save(tmp, "PNG"); os.replace(tmp, thumb)
+        except OSError: pass
+        return out
+
+    def prune(self, sources):
+        # Drop thumbnails whose source was edited, replaced or removed
+        keep = {os.path.basename(self.path_for(p)) for p in sources}
+        try: names = os.listdir(self.cache_dir)
+        except OSError: return
+        for n in names:
+            if n not in keep and not n.endswith(".tmp"):
+                try: os.remove(os.path.join(self.cache_dir, n))
+                except OSError: pass
+
+# ======================================================
+# TILE PYRAMID
+# ======================================================
+# Large reference images are cut into TILE x TILE PNG tiles at successive half
+# resolutions under .cache/tiles/<hash of path, mtime, size>/. meta.json is
+# written last, so its presence marks a complete pyramid.
+TILE_CACHE_DIR = os.path.join(CACHE_DIR, "tiles")
+
+class ImagePyramid:
+    TILE = 256
+
+    def __init__(self, src, cache_root=TILE_CACHE_DIR):
+        self.src = src; self.meta = None
+        self.dir = os.path.join(cache_root, hashlib.sha1(f"{os.path.abspath(src)}|{file_stat(src)}".encode()).hexdigest())
+
+    def tile_path(self, level, col, row): return os.path.join(self.dir, f"{level}_{col}_{row}.png")
+
+    @classmethod
+    def prune(cls, sources, cache_root=TILE_CACHE_DIR):
+        # Drop pyramids whose source was edited, replaced or removed
+        keep = {os.path.basename(cls(p, cache_root).dir) for p in sources}
+        try: names = os.listdir(cache_root)
+        except OSError: return
+        for n in names:
+            if n not in keep: shutil.rmtree(os.path.join(cache_root, n), ignore_errors=True)
+
+    def load_meta(self):
+        try:
+            with open(os.path.join(self.dir, "meta.json"), encoding="utf-8") as f: self.meta = json.load(f)
+        except (OSError, ValueError): self.meta = None
+        return self.meta
+
+    def build(self):
+        # Worker thread only: the one full decode of the source happens here, and only on a cache miss
+        if self.load_meta(): return self.meta
+        os.makedirs(self.dir, exist_ok=True); t = self.TILE; sizes = []
+        with Image.open(self.src) as im:
+            level = im.convert("RGBA") if im.mode not in ("RGB", "RGBA") else im.copy()
+        while True:
+            sizes.append(level.size); n = len(sizes) - 1
+            for x in range(0, level.width, t):
+                for y in range(0, level.height, t):
+                    level.crop((x, y, min(x + t, level.width), min(y + t, level.height))).save(self.tile_path(n, x // t, y // t), "PNG")
+            if max(level.size) <= t: break
+            level = level.reduce(2)
+        self.meta = {"width": sizes[0][0], "height": sizes[0][1], "tile": t, "sizes": sizes}
+        atomic_write_json(os.path.join(self.dir, "meta.json"), self.meta)
+        return self.meta
+
+    def load_tile(self, level, col, row, factor):
+        # Decoded and scaled to display size off the Tk thread; factor = display px per level px
+        with Image.open(self.tile_path(level, col, row)) as im:
+            im.load()
+            size = (max(1, round(im.width * factor)), max(1, round(im.height * factor)))
+            return im.resize(size, Image.BILINEAR) if size != im.size else im.copy()
+
+# ======================================================
+# AUTO BACKUP (CONTENT-ADDRESSED)
+# ======================================================
+# objects/<sha256> holds zlib-compressed file contents; each snapshot is a small
+# manifest of {relpath: hash, mtime, size}. Unchanged files (same mtime+size as
+# the previous snapshot) are neither re-read nor re-stored.
+BACKUP_DIR = os.path.join(DATA_DIR, "backups")
+DEFAULT_BACKUP_RETENTION = {"hourly": 24, "daily": 14, "weekly": 8}
+
+class BackupManager:
+    def __init__(self, data_dir=DATA_DIR, backup_dir=BACKUP_DIR):
+        self.data_dir = data_dir; self.backup_dir = backup_dir
+        self.obj_dir = os.path.join(backup_dir, "objects"); self.snap_dir = os.path.join(backup_dir, "snapshots")
+        self.lock = threading.Lock()
+
+    def data_files(self):
+        files = [p for p in (DB_FILE, MAINT_FILE, QUEUE_FILE, CONFIG_FILE, SQLITE_FILE) if os.path.exists(p)]
+        for root, _, names in os.walk(HISTORY_JOURNAL_DIR):
+            files.extend(os.path.join(root, n) for n in names if not n.endswith(".tmp"))
+        return files
+
+    def snapshots(self):
+        if not os.path.isdir(self.snap_dir): return []
+        return sorted(n[:-5] for n in os.listdir(self.snap_dir) if n.endswith(".json"))
+
+    def load_manifest(self, name):
+        with open(os.path.join(self.snap_dir, f"{name}.json"), 'r', encoding='utf-8') as f: return json.load(f)
+
+    def _object_path(self, digest): return os.path.join(self.obj_dir, digest[:2], digest)
+
+    def _read_source(self, path):
+        if path.endswith(".db"):
+            # Copy through the SQLite backup API so a WAL-mode database is captured consistently
+            tmp = os.path.join(self.backup_dir, "db_snapshot.tmp")
+            src = sqlite3.connect(path); dst = sqlite3.connect(tmp)
+            try: src.backup(dst)
+            finally: dst.close(); src.close()
+            with open(tmp, 'rb') as f: raw = f.read()
+            os.remove(tmp); return raw
+        with open(path, 'rb') as f: return f.read()
+
+    def _store_object(self, raw):
+        digest = hashlib.sha256(raw).hexdigest(); dst = self._object_path(digest)
+        if not os.path.exists(dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            with open(dst + ".tmp", 'wb') as f: f.write(zlib.compress(raw, 6))
+            os.replace(dst + ".tmp", dst)
+        return digest
+
+    def run(self, retention=None):
+        with self.lock:
+            os.makedirs(self.obj_dir, exist_ok=True); os.makedirs(self.snap_dir, exist_ok=True)
+            prev_names = self.snapshots()
+            prev = self.load_manifest(prev_names[-1])['files'] if prev_names else {}
+            files = {}; changed = 0
+            for path in self.data_files():
+                rel = os.path.relpath(path, self.data_dir).replace(os.sep, "/")
+                try: st = os.stat(path)
+                except OSError: continue
+                old = prev.get(rel)
+                if old and old['mtime'] == st.st_mtime_ns and old['size'] == st.st_size and os.path.exists(self._object_path(old['hash'])):
+                    files[rel] = old; continue
+                try: digest = self._store_object(self._read_source(path))
+                except OSError: continue
+                files[rel] = {"hash": digest, "mtime": st.st_mtime_ns, "size": st.st_size}
+                if not old or old['hash'] != digest: changed += 1
+            created = None
+            if changed or set(files) != set(prev):
+                created = base = datetime.now().strftime("%Y%m%d-%H%M%S"); n = 0
+                while os.path.exists(os.path.join(self.snap_dir, f"{created}.json")): n += 1; created = f"{base}-{n}" # Two runs in one second
+                atomic_write_json(os.path.join(self.snap_dir, f"{created}.json"), {"created": created, "files": files})
+            self.prune(retention or DEFAULT_BACKUP_RETENTION)
+            return created
+
+    def prune(self, retention):
+        names = self.snapshots()
+        keep = set(names[-1:])
+        tiers = {"hourly": "%Y%m%d%H", "daily": "%Y%m%d", "weekly": "%G%V"}
+        for tier, fmt in tiers.items():
+            seen = set()
+            for name in reversed(names):
+                bucket = datetime.strptime(name[:15], "%Y%m%d-%H%M%S").strftime(fmt) # Ignores a -N collision suffix
+                if bucket in seen: continue
+                if len(seen) >= int(retention.get(tier, 0)): break
+                seen.add(bucket); keep.add(name)
+        for name in names:
+            if name not in keep: os.remove(os.path.join(self.snap_dir, f"{name}.json"))
+        live = {f['hash'] for name in keep for f in self.load_manifest(name)['files'].values()}
+        for sub in os.listdir(self.obj_dir):
+            for digest in os.listdir(os.path.join(self.obj_dir, sub)):
+                if digest not in live and not digest.endswith(".tmp"): os.remove(os.path.join(self.obj_dir, sub, digest))
+
+    def restore(self, name, dest_dir=None):
+        # Under the lock so a scheduled backup can't snapshot (or prune objects) mid-restore
+        with self.lock: return self._restore(name, dest_dir or self.data_dir)
+
+    def _restore(self, name, dest_dir):
+        files = self.load_manifest(name)['files']; restored = 0
+        for rel, meta in files.items():
+            dst = os.path.join(dest_dir, *rel.split("/"))
+            # Fast path: skip files that already match the snapshot
+            if os.path.exists(dst):
+                st = os.stat(dst)
+                if st.st_size == meta['size'] and (st.st_mtime_ns == meta['mtime'] or hashlib.sha256(self._read_source(dst)).hexdigest() == meta['hash']): continue
+            with open(self._object_path(meta['hash']), 'rb') as f: raw = zlib.decompress(f.read())
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            with open(dst + ".tmp", 'wb') as f: f.write(raw); f.flush(); os.fsync(f.fileno())
+            os.replace(dst + ".tmp", dst); restored += 1
+        # Journal files newer than the snapshot would otherwise be replayed on top of it
+        journal_dir = os.path.join(dest_dir, os.path.relpath(HISTORY_JOURNAL_DIR, self.data_dir))
+        for root, _, names in os.walk(journal_dir):
+            for n in names:
+                rel = os.path.relpath(os.path.join(root, n), dest_dir).replace(os.sep, "/")
+                if rel not in files: os.remove(os.path.join(root, n))
+        return restored
+
+    def export_zip(self, name, zip_path):
+        with self.lock, zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for rel, meta in self.load_manifest(name)['files'].items():
+                with open(self._object_path(meta['hash']), 'rb') as f: zf.writestr(rel, zlib.decompress(f.read()))
+
+# ======================================================
+# TREEVIEW BINDING
+# ======================================================
+class TreeBinding:
+    # Keeps a Treeview in step with a keyed record list. Row iids are the record keys and each row's last rendered
+    # (values, image) is remembered, so a mutation only issues the inserts/updates/deletes that actually changed.
+    def __init__(self, tree, key, values, image=None):
+        self.tree = tree; self.key = key; self.values = values; self.image = image
+        self.rows = {}; self._pending = None
+
+    @property
+    def alive(self): return bool(self.tree.winfo_exists())
+
+    def _render(self, record): return (tuple(self.values(record)), self.image(record) if self.image else "")
+
+    def _apply(self, k, row, index="end"):
+        old = self.rows.get(k)
+        if old is None: self.tree.insert("", index, iid=k, values=row[0], image=row[1])
+        elif old != row: self.tree.item(k, values=row[0], image=row[1])
+        self.rows[k] = row
+
+    def put(self, record, index="end"):
+        k = self.key(record)
+        if self._pending is not None: self._pending[k] = (record, index)
+        elif self.alive: self._apply(k, self._render(record), index)
+
+    def patch(self, record):
+        # Like put() for an existing row, but rewrites only the cells whose rendered text changed
+        k = self.key(record); old = self.rows.get(k)
+        if old is None or self._pending is not None: self.put(record); return
+        row = self._render(record)
+        if row == old or not self.alive: return
+        cols = self.tree["columns"]
+        for i, (a, b) in enumerate(zip(old[0], row[0])):
+            if a != b: self.tree.set(k, cols[i], b)
+        if row[1] != old[1]: self.tree.item(k, image=row[1])
+        self.rows[k] = row
+
+    def remove(self, k):
+        if self._pending is not None: self._pending[k] = None
+        elif self.alive and self.rows.pop(k, None) is not None: self.tree.delete(k)
+
+    @contextmanager
+    def batch(self):
+        # Multi-select edits queue their changes; each key is rendered once and deletes go out in a single call
+        if self._pending is not None: yield self; return
+        self._pending = {}
+        try: yield self
+        finally:
+            pending, self._pending = self._pending, None
+            if self.alive:
+                gone = [k for k, v in pending.items() if v is None and self.rows.pop(k, None) is not None]
+                if gone: self.tree.delete(*gone)
+                for k, v in pending.items():
+                    if v is not None: self._apply(k, self._render(v[0]), v[1])
+
+    def sync(self, records):
+        # Full reconcile (page build / reload): drop stale rows, upsert the rest, then fix ordering only if it drifted
+        if not self.alive: return
+        order = []; seen = set()
+        for r in records:
+            k = self.key(r)
+            if k in seen: continue
+            seen.add(k); order.append(k); self._apply(k, self._render(r))
+        stale = [k for k in self.rows if k not in seen]
+        for k in stale: del self.rows[k]
+        if stale: self.tree.delete(*stale)
+        if list(self.tree.get_children("")) != order:
+            for i, k in enumerate(order): self.tree.move(k, "", i)
+
+class VirtualTree:
+    # Presents `count` logical rows through a fixed pool of Treeview items: the visible window plus BUFFER rows either
+    # side. The tree scrolls natively inside the pool; when it nears an edge the pool is re-centred and its rows rewritten
+    # in place, and the external scrollbar is driven from the logical position. Tk item count stays constant.
+    BUFFER = 40
+
+    def __init__(self, tree, scrollbar, row):
+        self.tree = tree; self.sb = scrollbar; self.row = row # row(i) -> values for logical row i
+        self.count = 0; self.base = 0; self.pool = []; self._busy = False
+        tree.configure(yscrollcommand=self._on_tree_scroll); scrollbar.configure(command=self.yview)
+
+    def set_count(self, count):
+        self.count = count; size = min(count, 2 * self.BUFFER + self._visible())
+        while len(self.pool) < size: self.pool.append(self.tree.insert("", "end"))
+        if len(self.pool) > size: self.tree.delete(*self.pool[size:]); del self.pool[size:]
+        self._fill(0); self.tree.yview_moveto(0)
+
+    def _visible(self):
+        try: rh = int(ttk.Style().lookup("Treeview", "rowheight") or 25)
+        except (ValueError, tk.TclError): rh = 25
+        return max(10, self.tree.winfo_height() // rh)
+
+    def _fill(self, base):
+        self.base = max(0, min(base, self.count - len(self.pool)))
+        self.tree.selection_remove(*self.tree.selection())
+        for n, iid in enumerate(self.pool): self.tree.item(iid, values=self.row(self.base + n))
+
+    def _on_tree_scroll(self, first, last):
+        if not self.pool: self.sb.set(0, 1); return
+        size = len(self.pool); first = float(first); last = float(last)
+        top = self.base + round(first * size); shown = max(1, round((last - first) * size))
+        near_top = self.base > 0 and top - self.base < self.BUFFER // 4
+        near_end = self.base + size < self.count and self.base + size - (top + shown) < self.BUFFER // 4
+        if (near_top or near_end) and not self._busy:
+            self._busy = True
+            try: self._fill(top - self.BUFFER); self.tree.yview_moveto((top - self.base) / size)
+            finally: self._busy = False
+            return
+        self.sb.set(top / self.count, min(1.0, (top + shown) / self.count))
+
+    def yview(self, *args):
+        if not self.pool: return
+        if args[0] == "moveto":
+            top = max(0, min(int(float(args[1]) * self.count), self.count - 1)); size = len(self.pool)
+            if not self.base <= top < self.base + size - self.BUFFER: self._fill(top - self.BUFFER)
+            self.tree.yview_moveto((top - self.base) / size)
+        else: self.tree.yview_scroll(int(args[1]), args[2])
+
+# ======================================================
+# DASHBOARD CHART
+# ======================================================
+CHART_RANGES = {"7 days": 7, "30 days": 30, "90 days": 90, "365 days": 365}
+
+class RevenueChart:
+    # One Figure, canvas and line for the lifetime of the dashboard. Updates go through set_data; when the axes
+    # frame is unchanged only the animated artists are redrawn over a cached background (blit), otherwise a
+    # single full draw recaptures it.
+    MAX_LABELS = 14
+
+    def __init__(self, parent):
+        self.fig = mpl_figure.Figure(figsize=(5, 3), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.line, = self.ax.plot([], [], marker='o', linewidth=2, markersize=6, animated=True)
+        self.texts = [self.ax.text(0, 0, "", ha='center', va='bottom', fontsize=8, animated=True) for _ in range(self.MAX_LABELS)]
+        self.ax.spines['top'].set_visible(False); self.ax.spines['right'].set_visible(False); self.ax.spines['left'].set_visible(False)
+        self.ax.grid(axis='y', linestyle='--', alpha=0.3)
+        self.canvas = mpl_tkagg.FigureCanvasTkAgg(self.fig, parent); self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.background = None; self.labels = None; self.colors = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def apply_theme(self, accent, bg, text):
+        if self.colors == (accent, bg, text): return
+        self.colors = (accent, bg, text)
+        self.fig.set_facecolor(bg); self.ax.set_facecolor(bg); self.line.set_color(accent)
+        self.ax.tick_params(axis='x', colors=text, rotation=45, labelsize=8); self.ax.tick_params(axis='y', colors=text)
+        for t in self.texts: t.set_color(text)
+        self.labels = None # Forces the next set_data to do a full draw
+
+    def set_data(self, labels, values):
+        n = len(values); top = max(values) if values else 0
+        self.line.set_data(range(n), values)
+        show = n <= self.MAX_LABELS
+        for i, t in enumerate(self.texts):
+            if show and i < n: t.set_position((i, values[i] + top * 0.05)); t.set_text(f"${int(values[i])}"); t.set_visible(True)
+            else: t.set_visible(False)
+        if labels == self.labels and self.background is not None and top * 1.1 <= self.ax.get_ylim()[1]: self._blit(); return
+        self.labels = list(labels)
+        step = max(1, math.ceil(n / self.MAX_LABELS))
+        self.ax.set_xticks(range(0, n, step)); self.ax.set_xticklabels(self.labels[::step])
+        self.ax.set_xlim(-0.5, max(n, 1) - 0.5); self.ax.set_ylim(0, max(top * 1.2, 1))
+        self.fig.tight_layout(); self.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox); self._draw_artists()
+
+    def _draw_artists(self):
+        self.ax.draw_artist(self.line)
+        for t in self.texts:
+            if t.get_visible(): self.ax.draw_artist(t)
+
+    def _blit(self):
+        self.canvas.restore_region(self.background); self._draw_artists(); self.canvas.blit(self.fig.bbox)
+
+SPARK_RANGES = {"1 hour": ("raw", 3600), "24 hours": ("1m", 86400), "7 days": ("1m", 7 * 86400), "90 days": ("1h", 90 * 86400)}
+SPARK_METRICS = (("nozzle_temper", "Nozzle", "{:.0f}°C"), ("bed_temper", "Bed", "{:.0f}°C"), ("mc_percent", "Progress", "{:.0f}%"), ("mc_remaining_time", "Remaining", "{:.0f} min"))
+
+class Sparkline:
+    # A tiny trend line on a plain Canvas (no matplotlib); set_data just moves the existing line's coords
+    def __init__(self, parent, title, fmt, width=200, height=40):
+        self.title = title; self.fmt = fmt; self.width = width; self.height = height
+        self.frame = ttk.Frame(parent, style='Card.TFrame')
+        self.label = ttk.Label(self.frame, text=title, font=("Segoe UI", 8), style='Sub.TLabel'); self.label.pack(anchor="w")
+        self.canvas = tk.Canvas(self.frame, width=width, height=height, highlightthickness=0); self.canvas.pack()
+        self.line = self.canvas.create_line(0, 0, 0, 0, width=1.5, state="hidden")
+
+    def set_data(self, values, bg, accent):
+        self.canvas.configure(bg=bg); self.canvas.itemconfig(self.line, fill=accent)
+        if len(values) < 2:
+            self.canvas.itemconfig(self.line, state="hidden"); self.label.config(text=self.title); return
+        if len(values) > self.width: values = values[::math.ceil(len(values) / self.width)] + values[-1:]
+        lo, hi = min(values), max(values); span = (hi - lo) or 1.0; pad = 3
+        sx = (self.width - 2 * pad) / (len(values) - 1); sy = (self.height - 2 * pad) / span
+        pts = []
+        for i, v in enumerate(values): pts += (pad + i * sx, self.height - pad - (v - lo) * sy)
+        self.canvas.coords(self.line, *pts); self.canvas.itemconfig(self.line, state="normal")
+        self.label.config(text=f"{self.title}  {self.fmt.format(values[-1])}")
+
+# ======================================================
+# ZOOM VIEWER
+# ======================================================
+class TiledImageViewer:
+    # Wheel-zoom / drag-pan viewer over an ImagePyramid. Only tiles intersecting the viewport are requested, from the
+    # pyramid level nearest the current zoom; TASKS decodes them and the Tk thread turns them into PhotoImages.
+    # Requests that scroll out of view are cancelled. Live tile images are kept in a bounded LRU.
+    MAX_SCALE = 4.0
+    LIVE_TILES = 192
+
+    def __init__(self, root, path):
+        self.pyramid = ImagePyramid(path); self.meta = None; self.scale = None; self.min_scale = None
+        self.top = tk.Toplevel(root); self.top.title(f"Zoom: {os.path.basename(path)}"); self.top.state('zoomed')
+        self.canvas = tk.Canvas(self.top, bg="black", highlightthickness=0); self.canvas.pack(fill="both", expand=True)
+        self.status = self.canvas.create_text(20, 20, anchor="nw", fill="white", text="⏳ Preparing image...")
+        self.items = {}; self.images = OrderedDict(); self.wanted = set(); self.requested = {} # key -> Task
+        self.alive = True
+        self.canvas.bind("<Configure>", lambda e: self.render())
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom(e, 1.25 if e.delta > 0 else 0.8))
+        self.canvas.bind("<Button-4>", lambda e: self.zoom(e, 1.25)); self.canvas.bind("<Button-5>", lambda e: self.zoom(e, 0.8))
+        self.canvas.bind("<ButtonPress-1>", lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind("<B1-Motion>", lambda e: (self.canvas.scan_dragto(e.x, e.y, gain=1), self.render()))
+        self.top.bind("<Destroy>", self._on_destroy)
+        TASKS.submit(self.pyramid.build, key=(id(self), "pyramid"), on_done=self._on_meta, on_error=self._on_build_error)
+
+    def _on_destroy(self, event):
+        if event.widget is not self.top: return
+        self.alive = False
+        for task in self.requested.values(): task.cancel()
+        self.requested.clear()
+
+    def _on_meta(self, meta):
+        if not self.alive: return
+        self.meta = meta; self.canvas.delete(self.status); self.render()
+
+    def _on_build_error(self, e):
+        if self.alive: self.canvas.itemconfig(self.status, text=f"⚠️ {e}")
+
+    def _on_tile(self, key, img):
+        self.requested.pop(key, None)
+        if not self.alive: return
+        self.images[key] = ImageTk.PhotoImage(img)
+        while len(self.images) > self.LIVE_TILES: self.images.popitem(last=False)
+        self._place(key)
+
+    def _level(self):
+        # Coarsest level that still has at least one level pixel per screen pixel
+        levels = len(self.meta["sizes"])
+        return max(0, min(levels - 1, int(math.floor(math.log2(1 / self.scale))) if self.scale < 1 else 0))
+
+    def _place(self, key):
+        if key not in self.wanted or key in self.items or key not in self.images: return
+        level, col, row, _ = key; step = self.meta["tile"] * (2 ** level) * self.scale
+        self.items[key] = self.canvas.create_image(round(col * step), round(row * step), image=self.images[key], anchor="nw", tags="tile")
+
+    def render(self):
+        if not self.meta or not self.alive: return
+        W, H = self.meta["width"], self.meta["height"]; vw = max(1, self.canvas.winfo_width()); vh = max(1, self.canvas.winfo_height())
+        if self.scale is None: self.min_scale = self.scale = min(1.0, vw / W, vh / H)
+        self.canvas.configure(scrollregion=(0, 0, W * self.scale, H * self.scale))
+        level = self._level(); t = self.meta["tile"]; lw, lh = self.meta["sizes"][level]
+        factor = (2 ** level) * self.scale; step = t * factor
+        x0, y0 = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        cols = range(max(0, int(x0 // step)), min(math.ceil(lw / t), int((x0 + vw) // step) + 1))
+        rows = range(max(0, int(y0 // step)), min(math.ceil(lh / t), int((y0 + vh) // step) + 1))
+        sk = round(self.scale, 6)
+        self.wanted = {(level, c, r, sk) for c in cols for r in rows}
+        for key in [k for k in self.items if k not in self.wanted]: self.canvas.delete(self.items.pop(key))
+        for key in [k for k in self.requested if k not in self.wanted]: self.requested.pop(key).cancel() # Scrolled away
+        for key in self.wanted:
+            if key in self.images: self.images.move_to_end(key); self._place(key)
+            elif key not in self.requested:
+                # A failed tile just drops out of requested and is retried on the next render
+                self.requested[key] = TASKS.submit(self.pyramid.load_tile, *key[:3], factor, key=(id(self), key),
+                                                   on_done=lambda img, k=key: self._on_tile(k, img), on_error=lambda e, k=key: self.requested.pop(k, None))
+
+    def zoom(self, event, factor):
+        if not self.meta or self.scale is None: return
+        old = self.scale; new = max(self.min_scale, min(self.MAX_SCALE, old * factor))
+        if new == old: return
+        ix, iy = self.canvas.canvasx(event.x) / old, self.canvas.canvasy(event.y) / old # Image point under the cursor
+        self.scale = new; W, H = self.meta["width"] * new, self.meta["height"] * new
+        self.canvas.delete("tile"); self.items.clear()
+        self.canvas.configure(scrollregion=(0, 0, W, H))
+        self.canvas.xview_moveto(max(0, ix * new - event.x) / W); self.canvas.yview_moveto(max(0, iy * new - event.y) / H)
+        self.render()
+
 # ======================================================
 # COLOR & ICON MANAGER
 # ======================================================
+COLOR_QUALIFIER_RE = re.compile(r'(matte|silk|basic|pla|petg|abs|tpu|\+|pro|tough|hyper|high speed)')
+
 class ColorManager:
+    ICON_SIZE = 16
+    ICON_CACHE_SIZE = 64
+    HEX_MEMO_SIZE = 4096
+
     def __init__(self):
-        self.cache = {}
+        self._hex_memo = {}; self.icons = OrderedDict() # (hex, abrasive) -> PhotoImage, least recently used first
         self.color_map = {
             'red': '#FF0000', 'crimson': '#DC143C', 'maroon': '#800000', 'ruby': '#E0115F',
             'blue': '#0000FF', 'navy': '#000080', 'royal': '#4169E1', 'sky': '#87CEEB', 'cyan': '#00FFFF', 'teal': '#008080',
@@ -102,76 +1698,82 @@ class ColorManager:
             'brown': '#A52A2A', 'beige': '#F5F5DC', 'tan': '#D2B48C', 'wood': '#DEB887',
             'pink': '#FFC0CB', 'clear': '#E0E0E0', 'transparent': '#E0E0E0', 'rainbow': 'RAINBOW'
         }
+        self._build_atlas()
 
     def get_hex(self, color_name):
-        c = color_name.lower()
-        clean = re.sub(r'(matte|silk|basic|pla|petg|abs|tpu|\+|pro|tough|hyper|high speed)', '', c).strip()
-        if clean in self.color_map: return self.color_map[clean]
-        for key, hex_val in self.color_map.items():
-            if key in clean: return hex_val
-        return "#CCCCCC"
-
-    def get_icon(self, color_name, is_abrasive=False):
-        hex_code = self.get_hex(color_name)
-        cache_key = f"{color_name}_{hex_code}_{is_abrasive}"
-        if cache_key in self.cache: return self.cache[cache_key]
-        
-        size = 16
-        img = Image.new("RGBA", (size, size), (0,0,0,0))
-        draw = ImageDraw.Draw(img)
-        
+        # Memoized: the strip + substring scan runs once per distinct colour string
+        hex_code = self._hex_memo.get(color_name)
+        if hex_code is None:
+            clean = COLOR_QUALIFIER_RE.sub('', color_name.lower()).strip()
+            hex_code = self.color_map.get(clean) or next((v for k, v in self.color_map.items() if k in clean), "#CCCCCC")
+            if len(self._hex_memo) >= self.HEX_MEMO_SIZE: self._hex_memo.clear()
+            self._hex_memo[color_name] = hex_code
+        return hex_code
+
+    def _draw_icon(self, draw, x0, y0, hex_code, is_abrasive):
+        size = self.ICON_SIZE
         if hex_code == 'RAINBOW':
             colors = ['#FF0000', '#FFA500', '#FFFF00', '#008000', '#0000FF', '#4B0082', '#EE82EE']
             for i, col in enumerate(colors):
-                draw.arc([1, 1, size-2, size-2], start=(i*(360/7)), end=((i+1)*(360/7)), fill=col, width=6)
+                draw.arc([x0+1, y0+1, x0+size-2, y0+size-2], start=(i*(360/7)), end=((i+1)*(360/7)), fill=col, width=6)
         else:
-            draw.ellipse([1, 1, size-2, size-2], fill=hex_code, outline="#666666", width=1)
+            draw.ellipse([x0+1, y0+1, x0+size-2, y0+size-2], fill=hex_code, outline="#666666", width=1)
             
         if is_abrasive:
-            draw.text((4, -2), "!", fill="red")
+            draw.text((x0+4, y0-2), "!", fill="red")
+
+    def _build_atlas(self):
+        # get_hex can only ever return a palette value or the fallback, so every icon is drawn here, once:
+        # one column per colour, plain row then abrasive row.
+        hexes = sorted(set(self.color_map.values()) | {"#CCCCCC"}); size = self.ICON_SIZE
+        self.atlas_slots = {h: n for n, h in enumerate(hexes)}
+        self.atlas = Image.new("RGBA", (size * len(hexes), size * 2), (0,0,0,0))
+        draw = ImageDraw.Draw(self.atlas)
+        for h, n in self.atlas_slots.items():
+            for row in (0, 1): self._draw_icon(draw, n * size, row * size, h, bool(row))
 
-        tk_img = ImageTk.PhotoImage(img)
-        self.cache[cache_key] = tk_img
+    def get_icon(self, color_name, is_abrasive=False):
+        key = (self.get_hex(color_name), bool(is_abrasive))
+        tk_img = self.icons.get(key)
+        if tk_img is not None: self.icons.move_to_end(key); return tk_img
+        size = self.ICON_SIZE; x = self.atlas_slots[key[0]] * size; y = size if key[1] else 0
+        tk_img = ImageTk.PhotoImage(self.atlas.crop((x, y, x + size, y + size)))
+        self.icons[key] = tk_img
+        # Evicted images stay alive while a Treeview row still references them (TreeBinding keeps the row's image)
+        if len(self.icons) > self.ICON_CACHE_SIZE: self.icons.popitem(last=False)
         return tk_img
 
 # ======================================================
 # AI MANAGER
 # ======================================================
 class AIManager:
+    # Construction only reads config; google.generativeai is imported and configured on first use.
     def __init__(self):
-        self.config = self.load_config()
-        self.api_key = self.config.get('gemini_api_key', '')
-        self.preferred_model = self.config.get('gemini_model', 'gemini-1.5-flash')
-        self.model = None
-        if HAS_GENAI and self.api_key:
+        self.api_key = CONFIG.gemini_api_key
+        self.preferred_model = CONFIG.gemini_model
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None and HAS_GENAI and self.api_key:
             try:
                 genai.configure(api_key=self.api_key)
                 self.setup_model(self.preferred_model)
             except: pass
+        return self._model
 
     def setup_model(self, model_name):
         try:
-            self.model = genai.GenerativeModel(model_name)
+            self._model = genai.GenerativeModel(model_name)
             self.preferred_model = model_name
             return True
         except: return False
 
-    def load_config(self):
-        if os.path.exists(CONFIG_FILE):
-            try: return json.load(open(CONFIG_FILE))
-            except: pass
-        return {}
-
     def save_config(self, key, model):
         self.api_key = key
         self.preferred_model = model
-        d = self.load_config()
-        d['gemini_api_key'] = key
-        d['gemini_model'] = model
-        json.dump(d, open(CONFIG_FILE,'w'))
-        if HAS_GENAI: 
-            genai.configure(api_key=key)
-            self.setup_model(model)
+        CONFIG.update(gemini_api_key=key, gemini_model=model)
+        self._model = None
 
     def analyze_slicer_screenshot(self, image_path):
         if not self.model: return {'error': "AI Model not loaded. Go to Settings -> Test AI."}
@@ -195,60 +1797,475 @@ class AIManager:
         except: return None
 
 # ======================================================
-# BAMBU CLIENT
+# BAMBU FLEET
 # ======================================================
+# Every printer's MQTT client runs on one shared "FleetNet" thread through paho's
+# external-loop API (one select() over all sockets) instead of loop_start() plus a
+# heartbeat thread per printer. The Tk thread only calls configure()/stop() and
+# reads states(). Telemetry is merged into the per-printer state table on the net
+# thread and the changed field names accumulate in a dirty map; the UI collects
+# them with take_changes() from a rate-limited tick, so a burst of reports costs
+# one row update per printer per tick instead of one Tk callback per message.
+PRINTER_MODELS = ("P1S", "P1P", "P2S", "X1C", "A1", "A1 mini")
+# pushall poll interval (s) by gcode_state. A job's first minutes poll fast for first-layer monitoring, and a
+# due poll is skipped while the printer is streaming delta reports by itself.
+POLL_INTERVALS = {"IDLE": 60.0, "FINISH": 60.0, "FAILED": 60.0, "OFFLINE": 30.0, "PAUSE": 15.0, "PREPARE": 3.0, "SLICING": 3.0, "RUNNING": 10.0}
+POLL_DEFAULT = 15.0
+POLL_FAST, POLL_FAST_WINDOW = 2.0, 300.0
+JOB_STATES = ("PREPARE", "SLICING", "RUNNING")
+RECONNECT_MIN, RECONNECT_MAX = 2.0, 120.0
+CONNACK_TIMEOUT = 10.0
+TELEMETRY_FPS = 4 # Upper bound on fleet UI refreshes per second; config 'telemetry_fps' overrides
+
+def fan_percent(v): return round(int(v) * 100 / 15) # Fan speeds are reported as 0-15 steps
+
+class ReportParser:
+    # One per printer. Turns a raw device/<serial>/report payload into the state fields it changed. A report is
+    # either a full pushall or a partial "print" delta, so a missing key means "unchanged". Non-print messages are
+    # rejected on the raw bytes without decoding; of the rest only subscribed keys whose raw value differs from the
+    # last report are converted, so a pushall that repeats known values costs little more than its decode.
+    # AMS trays merge per (unit, slot) into a fresh dict so snapshots handed to the UI are never mutated.
+    FIELDS = {
+        "gcode_state": ("gcode_state", str), "mc_percent": ("mc_percent", int), "mc_remaining_time": ("mc_remaining_time", int),
+        "subtask_name": ("subtask_name", str), "layer_num": ("layer_num", int), "total_layer_num": ("total_layer_num", int),
+        "nozzle_temper": ("nozzle_temper", float), "nozzle_target_temper": ("nozzle_target", float),
+        "bed_temper": ("bed_temper", float), "bed_target_temper": ("bed_target", float), "chamber_temper": ("chamber_temper", float),
+        "cooling_fan_speed": ("fan_part", fan_percent), "big_fan1_speed": ("fan_aux", fan_percent),
+        "big_fan2_speed": ("fan_chamber", fan_percent), "heatbreak_fan_speed": ("fan_heatbreak", fan_percent),
+        "spd_lvl": ("speed_level", int), "print_error": ("print_error", int), "wifi_signal": ("wifi_signal", str),
+    }
+    DEFAULTS = {"gcode_state": "OFFLINE", "mc_percent": 0, "mc_remaining_time": 0, "subtask_name": "", "layer_num": 0, "total_layer_num": 0,
+                "nozzle_temper": 0.0, "nozzle_target": 0.0, "bed_temper": 0.0, "bed_target": 0.0, "chamber_temper": 0.0,
+                "fan_part": 0, "fan_aux": 0, "fan_chamber": 0, "fan_heatbreak": 0, "speed_level": 0, "print_error": 0, "wifi_signal": "",
+                "ams": {}, "tray_now": ""}
+    KEYS = frozenset(FIELDS)
+    UNITS = "ABCD"
+    EMPTY_TRAY = {"type": "", "color": "", "remain": -1}
+
+    def __init__(self):
+        # orjson takes the bytes as-is; stdlib json is faster on a str than on bytes (no encoding sniffing)
+        self.loads = orjson.loads if HAS_ORJSON else lambda raw: json.loads(raw.decode())
+        self.raw = {} # Report key -> last raw value seen
+        self.raw_trays = {} # Tray label -> last raw tray dict
+        self.trays = {}; self.tray_now = None
+
+    def reset(self):
+        # After a reconnect the next pushall must be applied in full
+        self.raw.clear(); self.raw_trays.clear(); self.tray_now = None
+
+    def parse(self, raw):
+        # -> {state key: new value} (empty if nothing changed), or None if this isn't a print report
+        if b'"print"' not in raw: return None
+        p = self.loads(raw).get("print")
+        if not isinstance(p, dict): return None
+        out = {}; last = self.raw
+        for key in p.keys() & self.KEYS:
+            v = p[key]
+            if key in last and last[key] == v: continue
+            last[key] = v; name, conv = self.FIELDS[key]
+            try: out[name] = conv(v)
+            except (TypeError, ValueError): pass
+        if "ams" in p or "vt_tray" in p: self._merge_ams(p, out)
+        return out
+
+    def tray_label(self, unit, slot): return f"{self.UNITS[unit] if unit < len(self.UNITS) else unit}{slot + 1}"
+
+    def _merge_ams(self, p, out):
+        a = p.get("ams") or {}; new = {}
+        for unit in a.get("ams") or ():
+            for tray in unit.get("tray") or ():
+                try: label = self.tray_label(int(unit.get("id", 0)), int(tray.get("id", 0)))
+                except (TypeError, ValueError): continue
+                self._merge_tray(new, label, tray)
+        if isinstance(p.get("vt_tray"), dict): self._merge_tray(new, "Ext", p["vt_tray"])
+        if new: self.trays = {**self.trays, **new}; out["ams"] = self.trays
+        now = a.get("tray_now")
+        if now is not None and now != self.tray_now:
+            self.tray_now = now
+            try: n = int(now); out["tray_now"] = "Ext" if n == 254 else "" if n == 255 else self.tray_label(n // 4, n % 4)
+            except (TypeError, ValueError): pass
+
+    def _merge_tray(self, new, label, tray):
+        if self.raw_trays.get(label) == tray: return # Pushalls resend every tray; most are unchanged
+        self.raw_trays[label] = tray
+        if len(tray) == 1: t = dict(self.EMPTY_TRAY) # Only an id: the slot is empty
+        else:
+            t = dict(self.trays.get(label) or self.EMPTY_TRAY)
+            if "tray_type" in tray: t["type"] = tray["tray_type"]
+            if "tray_color" in tray: t["color"] = tray["tray_color"]
+            if "remain" in tray:
+                try: t["remain"] = int(tray["remain"])
+                except (TypeError, ValueError): pass
+        if self.trays.get(label) != t: new[label] = t
+
 class BambuPrinterClient:
-    def __init__(self, host, username, password, serial, status_callback, finish_callback):
-        self.host = host; self.username = username; self.password = password; self.serial = serial
-        self.status_callback = status_callback; self.finish_callback = finish_callback
-        self.client = None; self.connected = False; self.seq_id = 0
-        self.last_state = {"gcode_state": "OFFLINE", "mc_percent": 0, "nozzle_temper": 0, "bed_temper": 0}
-
-    def connect(self):
-        if not HAS_MQTT: return False
-        if not self.password or self.password == "None": return False
+    # One printer's connection and last-known state; only touched from the hub thread.
+
+    def __init__(self, cfg, hub):
+        self.cfg = dict(cfg); self.serial = cfg['serial']; self.hub = hub
+        self.client = None; self.sock = None; self.connected = False; self.closing = False; self.failed = None
+        self.attempt = None; self.handoff = None # Outstanding connect thread's token, and the (client, error) it hands back
+        self.seq_id = 0; self.failures = 0; self.retry_at = 0.0; self.connect_deadline = 0.0; self.next_pushall = 0.0
+        self.last_report = 0.0; self.job_started = None; self.reported_state = None; self.poll_interval = POLL_DEFAULT; self.poll_reason = "connecting"
+        self.counts = {"reports": 0, "pushalls": 0, "deferred": 0, "reconnects": 0}
+        self.parser = ReportParser()
+        self.state = dict(ReportParser.DEFAULTS, name=cfg.get('name') or self.serial, model=cfg.get('model', ''), link="OFFLINE", error="", last_seen=None)
+
+    def _set(self, **values):
+        with self.hub.lock:
+            changed = {k for k, v in values.items() if self.state.get(k) != v}
+            self.state.update(values)
+        self.hub.mark(self.serial, changed)
+
+    def open(self, now):
+        # The blocking TCP/TLS setup runs on a short-lived thread so an unreachable printer never stalls the
+        # shared loop; the net thread adopts the connected client in adopt() once it is handed back.
+        self.closing = False; self.failed = None; self.connect_deadline = now + CONNACK_TIMEOUT; self.parser.reset()
+        self._set(link="CONNECTING", error="")
+        c = mqtt.Client(client_id=f"PrintShop_{uuid.uuid4().hex[:8]}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv311)
+        ssl_ctx = ssl.create_default_context(); ssl_ctx.check_hostname = False; ssl_ctx.verify_mode = ssl.CERT_NONE
+        c.tls_set_context(ssl_ctx); c.tls_insecure_set(True)
+        c.username_pw_set("bblp", self.cfg.get('access_code'))
+        c.on_connect = self.on_connect; c.on_disconnect = self.on_disconnect; c.on_message = self.on_message
+        c.connect_timeout = 3.0
+        attempt = self.attempt = object()
+        threading.Thread(target=self._connect, args=(c, attempt), name=f"FleetConnect-{self.serial}", daemon=True).start()
+
+    def _connect(self, c, attempt):
+        try: c.connect(self.cfg.get('ip'), 8883, 60); result = (c, None)
+        except Exception as e: result = (c, e)
+        with self.hub.lock:
+            current = self.attempt is attempt
+            if current: self.handoff = result
+        if current: self.hub._wake()
+        else: self._discard(c) # Closed or timed out meanwhile
+
+    @staticmethod
+    def _discard(c):
+        c.on_connect = c.on_disconnect = c.on_message = None
         try:
-            cid = f"PrintShop_{uuid.uuid4().hex[:8]}"
-            self.client = mqtt.Client(client_id=cid, callback_api_version=mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv311)
-            ssl_ctx = ssl.create_default_context(); ssl_ctx.check_hostname = False; ssl_ctx.verify_mode = ssl.CERT_NONE
-            self.client.tls_set_context(ssl_ctx); self.client.tls_insecure_set(True)
-            self.client.username_pw_set(self.username, self.password)
-            self.client.on_connect = self.on_connect; self.client.on_disconnect = self.on_disconnect; self.client.on_message = self.on_message
-            self.client.connect(self.host, 8883, 60); self.client.loop_start(); self.start_heartbeat()
-            return True
-        except: return False
-
-    def start_heartbeat(self):
-        def loop():
-            while True:
-                if self.connected: self.send_pushall()
-                time.sleep(5)
-        threading.Thread(target=loop, daemon=True).start()
+            s = c.socket()
+            if s: s.close()
+        except Exception: pass
+
+    def adopt(self, now):
+        # Net thread, while a connect thread is out: take over its client, or give up at the CONNACK deadline
+        with self.hub.lock: result, self.handoff = self.handoff, None
+        if result is None:
+            if now >= self.connect_deadline: self.failed = "No response"
+            return
+        self.attempt = None; c, err = result
+        self.client = c; self.sock = c.socket()
+        if err is not None: self.failed = str(err) or type(err).__name__
+
+    def close(self):
+        with self.hub.lock: self.attempt = None; pending, self.handoff = self.handoff, None
+        if pending: self._discard(pending[0])
+        c, s = self.client, self.sock; self.client = self.sock = None; self.connected = False
+        if c:
+            self.closing = True
+            try: c.disconnect()
+            except Exception: pass
+        if s:
+            try: s.close()
+            except Exception: pass
+
+    def drop(self, reason, now):
+        # Tear down and retry with exponential backoff (jittered so a power blip doesn't reconnect the whole farm at once)
+        self.close(); self.failures += 1; self.failed = None; self.counts['reconnects'] += 1
+        delay = min(RECONNECT_MAX, RECONNECT_MIN * 2 ** (self.failures - 1)) * random.uniform(0.8, 1.2)
+        self.retry_at = now + delay
+        self._set(link="OFFLINE", gcode_state="OFFLINE", error=f"{reason} (retry in {delay:.0f}s)")
+
+    def poll_plan(self, now):
+        # -> (interval, reason) for this printer's next pushall
+        gs = self.state['gcode_state']
+        if self.job_started is not None and now - self.job_started < POLL_FAST_WINDOW: return POLL_FAST, "job start"
+        if gs == "RUNNING" and 0 < self.state['layer_num'] <= 1: return POLL_FAST, "first layer"
+        return POLL_INTERVALS.get(gs, POLL_DEFAULT), gs.lower()
+
+    def poll(self, now):
+        # Called by the hub when a pushall is due. If reports arrived within the interval anyway, push the poll back.
+        self.poll_interval, self.poll_reason = self.poll_plan(now)
+        if now - self.last_report < self.poll_interval:
+            self.next_pushall = self.last_report + self.poll_interval; self.counts['deferred'] += 1
+            self.poll_reason += ", deltas arriving"
+        else: self.send_pushall(); self.next_pushall = now + self.poll_interval
 
     def send_pushall(self):
-        self.seq_id += 1
+        self.counts['pushalls'] += 1; self.seq_id += 1
         payload = {"pushing": {"sequence_id": str(self.seq_id), "command": "pushall"}}
         try: self.client.publish(f"device/{self.serial}/request", json.dumps(payload))
         except: pass
 
     def on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
-            self.connected = True
+            self.connected = True; self.failures = 0
             client.subscribe(f"device/{self.serial}/report")
-            self.send_pushall()
+            self.send_pushall(); self.next_pushall = time.monotonic() + POLL_FAST
+            self._set(link="ONLINE", error="")
+        else: self.failed = f"Refused: {rc}"
+
+    def on_disconnect(self, client, userdata, flags, rc, properties=None):
+        self.connected = False
+        if not self.closing: self.failed = f"Disconnected: {rc}"
 
-    def on_disconnect(self, client, userdata, flags, rc, properties=None): self.connected = False
     def on_message(self, client, userdata, msg):
+        try: updates = self.parser.parse(msg.payload)
+        except (ValueError, AttributeError): return # Malformed JSON or a non-object document
+        if updates is None: return
+        now = time.monotonic(); self.last_report = now; self.counts['reports'] += 1
+        # Job starts are judged against what the printer last reported, not the display state: drop() shows
+        # OFFLINE, and the pushall after a reconnect (or the first one after launch) is not a new job
+        gs = updates.get('gcode_state'); prev = self.reported_state
+        if gs is not None: self.reported_state = gs
+        if gs in JOB_STATES and prev is not None and prev not in JOB_STATES:
+            self.job_started = now; self.next_pushall = min(self.next_pushall, now + POLL_FAST) # Job just started: poll fast now
+        elif gs is not None and gs not in JOB_STATES: self.job_started = None
+        with self.hub.lock: self.state['last_seen'] = time.time() # Not a display field; never marks the printer dirty
+        if updates: self._set(**updates)
+        if self.hub.history: self.hub.history.observe(self.serial, self.state, updates)
+
+class FleetHub:
+    def __init__(self, history=None):
+        self.lock = threading.Lock(); self.history = history # TelemetryHistory fed from the net thread, if any
+        self.links = {} # serial -> BambuPrinterClient; mutated by the net thread only
+        self.dirty = {} # serial -> changed field names since the last take_changes(), or None once removed
+        self.stats = {"updates": 0, "merged": 0, "unchanged": 0, "delivered": 0}
+        self.wanted = None # Pending {serial: cfg} from configure(), applied by the net thread
+        self.thread = None; self.stopped = False; self._wake_r = self._wake_w = None
+
+    def configure(self, printers):
+        with self.lock: self.wanted = {p['serial']: dict(p) for p in printers if p.get('serial') and p.get('access_code')}
+        if self.thread is None:
+            if not self.wanted: return
+            self.stopped = False; self._wake_r, self._wake_w = socket.socketpair(); self._wake_r.setblocking(False)
+            self.thread = threading.Thread(target=self._run, name="FleetNet", daemon=True); self.thread.start()
+        else: self._wake()
+
+    def states(self):
+        with self.lock: return {s: dict(link.state) for s, link in self.links.items()}
+
+    def diagnostics(self):
+        # Poll scheduling and connection counters per printer; plain attribute reads, good enough for a status view
+        now = time.monotonic(); out = {}
+        with self.lock: links = list(self.links.items())
+        for serial, link in links:
+            out[serial] = dict(link.counts, name=link.state['name'], link=link.state['link'], gcode_state=link.state['gcode_state'],
+                               reason=link.poll_reason, interval=link.poll_interval, failures=link.failures,
+                               next_poll=link.next_pushall - now if link.connected else None,
+                               last_report=now - link.last_report if link.last_report else None)
+        return out
+
+    def stop(self, timeout=2.0):
+        if self.thread is None: return
+        self.stopped = True; self._wake(); self.thread.join(timeout); self.thread = None
+        for s in (self._wake_r, self._wake_w):
+            try: s.close()
+            except Exception: pass
+
+    def _wake(self):
+        try: self._wake_w.send(b"x")
+        except (OSError, AttributeError): pass
+
+    def mark(self, serial, changed, removed=False):
+        with self.lock:
+            self.stats['updates'] += 1
+            if not changed and not removed: self.stats['unchanged'] += 1; return # Dropped: nothing visible changed
+            fields = self.dirty.get(serial, False)
+            if fields is not False: self.stats['merged'] += 1 # Folded into an update the UI hasn't collected yet
+            if removed: self.dirty[serial] = None
+            elif fields: fields.update(changed)
+            else: self.dirty[serial] = set(changed)
+
+    def take_changes(self):
+        # {serial: (state copy, changed fields)}, or (None, None) for removed printers; resets the dirty map
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+            self.stats['delivered'] += len(dirty)
+            return {s: (None, None) if f is None or s not in self.links else (dict(self.links[s].state), f) for s, f in dirty.items()}
+
+    def _reconcile(self):
+        with self.lock: wanted, self.wanted = self.wanted, None
+        if wanted is None: return
+        for serial, link in list(self.links.items()):
+            if wanted.get(serial) == link.cfg: continue
+            link.close()
+            with self.lock: del self.links[serial]
+            self.mark(serial, None, removed=True)
+        for serial, cfg in wanted.items():
+            if serial in self.links: continue
+            link = BambuPrinterClient(cfg, self)
+            with self.lock: self.links[serial] = link
+            if not HAS_MQTT: link.state['error'] = "paho-mqtt is not installed"
+            self.mark(serial, set(link.state))
+
+    def _step(self, now):
+        for link in self.links.values():
+            if link.attempt is not None: link.adopt(now)
+            elif link.client is None:
+                if HAS_MQTT and now >= link.retry_at:
+                    try: link.open(now)
+                    except Exception as e: link.drop(e, now)
+            elif not link.connected and now >= link.connect_deadline: link.failed = link.failed or "No response"
+            elif link.connected and now >= link.next_pushall: link.poll(now)
+        socks = {link.sock: link for link in self.links.values() if link.sock is not None and not link.failed}
+        # TLS can hold decrypted bytes select() can't see; treat those sockets as readable right away
+        pending = [s for s in socks if getattr(s, "pending", lambda: 0)()]
+        wlist = [s for s, link in socks.items() if link.client.want_write()]
+        r, w, _ = select.select([self._wake_r, *socks], wlist, [], 0 if pending else 0.5)
+        if self._wake_r in r:
+            try:
+                while self._wake_r.recv(512): pass
+            except OSError: pass
+        for s in set(r).union(pending):
+            link = socks.get(s)
+            if not link or not link.client: continue
+            rc = link.client.loop_read()
+            if rc != 0: link.failed = link.failed or f"Connection lost: {rc}"
+        for s in w:
+            link = socks[s]
+            if not link.client: continue
+            rc = link.client.loop_write()
+            if rc != 0: link.failed = link.failed or f"Connection lost: {rc}"
+        for link in socks.values():
+            if link.client: link.client.loop_misc() # Keepalive pings and timeouts
+        for link in self.links.values():
+            if link.failed: link.drop(link.failed, time.monotonic())
+
+    def _run(self):
         try:
-            raw_txt = msg.payload.decode()
-            payload = json.loads(raw_txt)
-            p = payload.get('print', payload)
-            for key in ["gcode_state", "mc_percent", "mc_remaining_time", "nozzle_temper", "bed_temper", "subtask_name"]:
-                if key in p: self.last_state[key] = p[key]
-            self.status_callback(self.last_state)
-        except: pass
-    def disconnect(self):
-        if self.client: self.client.loop_stop(); self.client.disconnect(); self.connected = False
+            while not self.stopped:
+                self._reconcile()
+                try: self._step(time.monotonic())
+                except (OSError, ValueError): time.sleep(0.5) # A socket closed under select(); the next pass drops it
+        finally:
+            for link in self.links.values(): link.close()
+
+# ======================================================
+# TELEMETRY HISTORY
+# ======================================================
+# Per-printer time series in fixed-size rings of float64 rows (t, metric...), each
+# ring a memory-mapped file: writes go straight into the page cache, memory stays
+# flat however long the app runs, and history survives restarts. Raw samples roll
+# up into 1-minute and 1-hour tiers (means) as their buckets close.
+TELEMETRY_DIR = os.path.join(DATA_DIR, "telemetry")
+TELEMETRY_METRICS = ("nozzle_temper", "bed_temper", "chamber_temper", "mc_percent", "mc_remaining_time")
+TELEMETRY_TIERS = (("raw", 0, 7200), ("1m", 60, 10080), ("1h", 3600, 2160)) # (name, bucket seconds, capacity): ~2 h / 7 d / 90 d at 1 Hz
+
+class RingSeries:
+    # File layout (all float64): [magic, version, capacity, width, head, count] + t[capacity] + one column[capacity] per metric
+    MAGIC, VERSION, HEADER = 1414746194.0, 1.0, 6
+
+    def __init__(self, path, capacity, width):
+        self.path = path; self.capacity = capacity; self.width = width
+        size = (self.HEADER + capacity * (width + 1)) * 8
+        fresh = not os.path.exists(path) or os.path.getsize(path) != size
+        self.f = open(path, 'w+b' if fresh else 'r+b')
+        if fresh: self.f.truncate(size)
+        self.mm = mmap.mmap(self.f.fileno(), size); self.buf = memoryview(self.mm).cast('d')
+        if fresh or tuple(self.buf[:4]) != (self.MAGIC, self.VERSION, float(capacity), float(width)):
+            self.buf[:self.HEADER] = array('d', (self.MAGIC, self.VERSION, capacity, width, 0, 0))
+        self.head = int(self.buf[4]); self.count = int(self.buf[5])
+
+    def __len__(self): return self.count
+
+    def append(self, t, values):
+        buf = self.buf; i = self.head; cap = self.capacity; base = self.HEADER + i
+        buf[base] = t
+        for j, v in enumerate(values, 1): buf[base + j * cap] = v
+        self.head = (i + 1) % cap; self.count = min(self.count + 1, cap)
+        buf[4] = self.head; buf[5] = self.count
+
+    def tail(self, column, n):
+        # Last n values of a column (0 = timestamps, 1.. = metrics), oldest first
+        n = min(n, self.count); cap = self.capacity
+        if n <= 0: return []
+        off = self.HEADER + column * cap; start = (self.head - n) % cap
+        if start + n <= cap: return self.buf[off + start:off + start + n].tolist()
+        return self.buf[off + start:off + cap].tolist() + self.buf[off:off + (start + n - cap)].tolist()
+
+    def flush(self): self.mm.flush()
+
+    def close(self):
+        self.buf.release(); self.mm.close(); self.f.close()
+
+class PrinterSeries:
+    def __init__(self, directory, name, metrics):
+        self.lock = threading.Lock(); self.width = len(metrics)
+        self.tiers = [(tier, step, RingSeries(os.path.join(directory, f"{name}.{tier}.ring"), cap, self.width)) for tier, step, cap in TELEMETRY_TIERS]
+        self.acc = [None] * len(self.tiers) # Per rolled-up tier: [bucket start, n, sums...] of the open bucket
+        self.last_t = 0.0
+
+    def record(self, t, values):
+        with self.lock:
+            self.tiers[0][2].append(t, values); self.last_t = t
+            self._roll(1, t, values)
+
+    def _roll(self, level, t, values):
+        if level >= len(self.tiers): return
+        step = self.tiers[level][1]; bucket = t - t % step; acc = self.acc[level]
+        if acc is not None and acc[0] != bucket:
+            # The open bucket closed: its mean becomes one row here and one sample for the tier above
+            means = [s / acc[1] for s in acc[2:]]
+            self.tiers[level][2].append(acc[0], means); self._roll(level + 1, acc[0], means)
+            acc = None
+        if acc is None: acc = self.acc[level] = [bucket, 0] + [0.0] * self.width
+        acc[1] += 1
+        for j, v in enumerate(values, 2): acc[j] += v
+
+    def window(self, tier, column, since):
+        with self.lock:
+            for name, _, ring in self.tiers:
+                if name != tier: continue
+                ts = ring.tail(0, len(ring)); n = len(ts) - bisect.bisect_left(ts, since)
+                return ring.tail(column, n)
+        return []
+
+    def close(self):
+        with self.lock:
+            for _, _, ring in self.tiers: ring.flush(); ring.close()
+
+class TelemetryHistory:
+    # Written from the fleet thread (record), read from the Tk thread (tail); each printer has its own lock
+    HEARTBEAT = 10.0 # Record an unchanged reading at least this often so steady values don't leave gaps
+
+    def __init__(self, directory=TELEMETRY_DIR, metrics=TELEMETRY_METRICS):
+        self.dir = directory; self.metrics = metrics; self.metric_set = frozenset(metrics); self.printers = {}; self.lock = threading.Lock()
+        self.samples = 0
+
+    def _series(self, serial):
+        s = self.printers.get(serial)
+        if s is None:
+            with self.lock:
+                s = self.printers.get(serial)
+                if s is None:
+                    os.makedirs(self.dir, exist_ok=True)
+                    s = self.printers[serial] = PrinterSeries(self.dir, self._name(serial), self.metrics)
+        return s
+
+    @staticmethod
+    def _name(serial): return re.sub(r"[^A-Za-z0-9_-]", "_", serial)
+
+    def observe(self, serial, state, changed, t=None):
+        # Called per report: records a row when a metric changed, or as a heartbeat for steady readings
+        t = time.time() if t is None else t; s = self._series(serial)
+        if self.metric_set.isdisjoint(changed) and t - s.last_t < self.HEARTBEAT: return
+        try: s.record(t, [float(state.get(m) or 0) for m in self.metrics])
+        except (TypeError, ValueError): return
+        self.samples += 1
+
+    def window(self, serial, metric, seconds, tier="raw", now=None):
+        # Values of one metric from the last `seconds`, oldest first
+        s = self.printers.get(serial)
+        if s is None and os.path.exists(os.path.join(self.dir, f"{self._name(serial)}.raw.ring")): s = self._series(serial) # Recorded by an earlier run
+        return s.window(tier, self.metrics.index(metric) + 1, (time.time() if now is None else now) - seconds) if s else []
+
+    def close(self):
+        with self.lock: printers, self.printers = list(self.printers.values()), {}
+        for s in printers:
+            try: s.close()
+            except Exception: pass
 
 # ======================================================
 # MAIN APP
@@ -263,18 +2280,27 @@ class FilamentManagerApp:
         self.setup_theme_colors()
         self.style = ttk.Style(theme=self.current_theme_name)
         self.configure_styles()
+        STARTUP.mark("init: theme & styles")
         
         self.ai_manager = AIManager()
         self.color_manager = ColorManager()
-        self.icon_cache = {}; self.ref_images_cache = [] 
+        self.icon_cache = {}; self._filter_after = None
+        self.thumbnails = ThumbnailCache(); self.gallery_tabs = {}; self.gallery_images = OrderedDict()
+        self.inv_rows = self.queue_rows = self.maint_rows = None
         
-        self.perform_auto_backup()
+        self.backup_manager = BackupManager()
         self.defaults = self.load_sticky_settings()
         self.printer_cfg = self.load_printer_config()
+        self.history_journal = HistoryJournal(HISTORY_FILE, HISTORY_JOURNAL_DIR); self.history_journal.open()
+        self.store = open_store(self.history_journal); self.store.attach(self); self.store.on_written = self.note_own_write
+        self.snapshot_cache = SnapshotCache(); self.data_signature = {}
+        WRITER.listeners.append(self.note_own_write)
+        STARTUP.mark("init: managers & stores")
         self.load_all_data() 
         self.init_materials_data()
         self.init_resource_links()
         if not self.maintenance: self.init_default_maintenance()
+        STARTUP.mark("init: load data")
             
         self.current_job_filaments = []
         self.calc_vals = {"mat_cost": 0, "electricity": 0, "labor": 0, "swaps": 0, "subtotal": 0, "total": 0, "profit": 0, "hours": 0, "rate": 0, "batch": 1, "unit_price": 0}
@@ -291,6 +2317,7 @@ class FilamentManagerApp:
         self.nav_btns = {}
         self.create_nav_btn("Dashboard", self.show_dashboard)
         self.create_nav_btn("Projects", self.show_history)
+        self.create_nav_btn("Reports", self.show_reports)
         self.create_nav_btn("Inventory", self.show_inventory)
         self.create_nav_btn("Calculator", self.show_calculator)
         self.create_nav_btn("Slicer Reader (AI)", self.show_ai_reader)
@@ -306,10 +2333,18 @@ class FilamentManagerApp:
         self.content_area.pack(side="right", fill="both", expand=True)
 
         self.current_page_method = self.show_dashboard 
-        self.printer_client = None
-        if self.printer_cfg.get("enabled"): self.start_printer_listener()
+        self.pages = {}; self.current_page = None; self.chart_key = None; self.revenue_chart = None
+        self.telemetry = TelemetryHistory(); self.fleet = FleetHub(self.telemetry); self.fleet_rows = None; self.spark_key = None; self.spark_at = 0.0
+        self.fleet_interval = max(50, int(1000 / max(0.1, float(CONFIG.get('telemetry_fps', TELEMETRY_FPS)))))
+        self.root.after(self.fleet_interval, self.fleet_tick)
+        STARTUP.mark("init: layout")
+        # paho-mqtt is imported by the first connect; keep it off the critical path
+        if self.printer_cfg.get("enabled"): self.root.after(250, self.start_printer_listener)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close); TASKS.attach(self.root)
+        self.root.after(500, self.perform_auto_backup); self.root.after(1000, self.check_write_errors)
             
         self.show_dashboard()
+        STARTUP.mark("init: dashboard")
 
     def configure_styles(self):
         self.style.configure("Treeview", rowheight=30, font=("Segoe UI", 9))
@@ -338,6 +2373,8 @@ class FilamentManagerApp:
 
     def toggle_theme(self):
         new_theme = "darkly" if self.current_theme_name == "litera" else "litera"
+        old_bg = (self.ACCENT_LIGHT, self.BG_COLOR, self.CARD_BG) # CARD_BG last: it wins where a palette reuses a colour
+        old_fg = (self.TEXT_COLOR, self.TEXT_SECONDARY, self.ACCENT_COLOR)
         self.current_theme_name = new_theme
         self.style.theme_use(new_theme)
         self.setup_theme_colors()
@@ -346,11 +2383,31 @@ class FilamentManagerApp:
         for widget in self.sidebar.winfo_children():
             if isinstance(widget, ttk.Label): widget.configure(background=self.CARD_BG, foreground=self.ACCENT_COLOR)
             if isinstance(widget, ttk.Button): widget.configure(style='Nav.TButton' if 'Nav' in str(widget.winfo_name) else 'Ghost.TButton')
-        self.current_page_method() 
+        # Retained pages are recoloured in place rather than rebuilt
+        bg = dict(zip(old_bg, (self.ACCENT_LIGHT, self.BG_COLOR, self.CARD_BG))); fg = dict(zip(old_fg, (self.TEXT_COLOR, self.TEXT_SECONDARY, self.ACCENT_COLOR)))
+        for page in self.pages.values(): self.recolor_widgets(page, bg, fg)
+        if self.current_page is self.pages.get("dashboard"): self.refresh_dashboard_page()
 
     # --- UI HELPERS ---
-    def clear_content(self):
-        for widget in self.content_area.winfo_children(): widget.destroy()
+    def show_page(self, name, build, on_show=None):
+        # Pages are built once, then hidden/shown; on_show refreshes a retained page from the live records
+        page = self.pages.get(name)
+        if page is None or not page.winfo_exists():
+            page = self.pages[name] = ttk.Frame(self.content_area); build(page)
+        elif on_show: on_show()
+        if self.current_page is not page:
+            if self.current_page is not None and self.current_page.winfo_exists(): self.current_page.pack_forget()
+            page.pack(fill="both", expand=True); self.current_page = page
+
+    def recolor_widgets(self, root, bg, fg):
+        stack = [root]
+        while stack:
+            w = stack.pop(); stack.extend(w.winfo_children())
+            if w.winfo_class() in ("Listbox", "Text", "Canvas"): continue # Fixed-colour content widgets
+            for opt, mapping in (("background", bg), ("foreground", fg)):
+                try: val = str(w.cget(opt))
+                except tk.TclError: continue
+                if val in mapping: w.configure(**{opt: mapping[val]})
 
     def create_card(self, parent, title=None, row=0, col=0, colspan=1, rowspan=1, padding=20):
         card = ttk.Frame(parent, style='Card.TFrame', padding=padding) 
@@ -380,14 +2437,16 @@ class FilamentManagerApp:
     # --- DASHBOARD ---
     def show_dashboard(self):
         self.current_page_method = self.show_dashboard
-        self.clear_content()
-        head = ttk.Frame(self.content_area); head.pack(fill="x", pady=(0, 30))
+        self.show_page("dashboard", self.build_dashboard_page, self.refresh_dashboard_page)
+
+    def build_dashboard_page(self, page):
+        head = ttk.Frame(page); head.pack(fill="x", pady=(0, 30))
         ttk.Label(head, text="Fleet Dashboard", font=("Segoe UI", 24, "bold")).pack(side="left")
-        self.lbl_printer_status = ttk.Label(head, text="Printer: Offline", font=("Segoe UI", 10), foreground=self.TEXT_SECONDARY, background=self.BG_COLOR)
+        self.lbl_printer_status = ttk.Label(head, text="Fleet: Offline", font=("Segoe UI", 10), foreground=self.TEXT_SECONDARY, background=self.BG_COLOR)
         self.lbl_printer_status.pack(side="right", padx=10)
         ttk.Button(head, text="Refresh", style='Ghost.TButton', command=self.refresh_dashboard).pack(side="right")
 
-        grid = ttk.Frame(self.content_area); grid.pack(fill="x")
+        grid = ttk.Frame(page); grid.pack(fill="x")
         grid.columnconfigure(0, weight=1); grid.columnconfigure(1, weight=1); grid.columnconfigure(2, weight=1); grid.columnconfigure(3, weight=1)
 
         c1, self.lbl_stat_proj, self.lbl_sub_proj = self.create_stat_card(grid, "Total Projects", "...", "...", "📦")
@@ -399,62 +2458,114 @@ class FilamentManagerApp:
         c4, self.lbl_stat_low, self.lbl_sub_low = self.create_stat_card(grid, "Low Stock", "...", "...", "⚠️")
         c4.grid(row=0, column=3, sticky="ew", padx=10)
 
+        fleet_card = ttk.Frame(page, style='Card.TFrame', padding=15); fleet_card.pack(fill="x", padx=10, pady=(20, 0))
+        fleet_head = ttk.Frame(fleet_card, style='Card.TFrame'); fleet_head.pack(fill="x", pady=(0, 10))
+        ttk.Label(fleet_head, text="Printers", font=("Segoe UI", 12, "bold"), background=self.CARD_BG, foreground=self.TEXT_COLOR).pack(side="left")
+        ttk.Button(fleet_head, text="🩺 Diagnostics", style='Ghost.TButton', command=self.show_fleet_diagnostics).pack(side="right")
+        self.lbl_fleet_stats = ttk.Label(fleet_head, text="", font=("Segoe UI", 8), background=self.CARD_BG, foreground=self.TEXT_SECONDARY); self.lbl_fleet_stats.pack(side="right", padx=10)
+        cols = ("Printer", "Model", "Status", "Progress", "Layer", "Remaining", "Nozzle", "Bed", "Fan", "Active Tray", "Job")
+        self.fleet_tree = ttk.Treeview(fleet_card, columns=cols, show="headings", height=5)
+        for c in cols: self.fleet_tree.heading(c, text=c); self.fleet_tree.column(c, anchor="center", width=90)
+        self.fleet_tree.column("Status", width=220); self.fleet_tree.column("Job", width=220, anchor="w")
+        self.fleet_tree.pack(fill="x")
+        self.fleet_rows = TreeBinding(self.fleet_tree, lambda r: r[0], self.fleet_row_values)
+        spark_bar = ttk.Frame(fleet_card, style='Card.TFrame'); spark_bar.pack(fill="x", pady=(10, 0))
+        head = ttk.Frame(spark_bar, style='Card.TFrame'); head.pack(side="left", anchor="n", padx=(0, 15))
+        self.lbl_spark_printer = ttk.Label(head, text="", font=("Segoe UI", 9, "bold"), background=self.CARD_BG, foreground=self.TEXT_COLOR); self.lbl_spark_printer.pack(anchor="w")
+        self.v_spark_range = tk.StringVar(value=CONFIG.get('telemetry_range', "1 hour"))
+        cb = ttk.Combobox(head, textvariable=self.v_spark_range, values=list(SPARK_RANGES), state="readonly", width=9); cb.pack(anchor="w", pady=(5, 0))
+        cb.bind("<<ComboboxSelected>>", lambda e: (CONFIG.set('telemetry_range', self.v_spark_range.get()), self.update_sparklines(force=True)))
+        self.sparklines = {}
+        for metric, title, fmt in SPARK_METRICS:
+            sp = self.sparklines[metric] = Sparkline(spark_bar, title, fmt); sp.frame.pack(side="left", padx=8)
+        self.fleet_tree.bind("<<TreeviewSelect>>", lambda e: self.update_sparklines(force=True))
+        self.refresh_fleet_table()
+
         if HAS_MATPLOTLIB:
-            chart_wrapper = ttk.Frame(self.content_area)
+            chart_wrapper = ttk.Frame(page)
             chart_wrapper.pack(fill="both", expand=True, pady=20)
             chart_wrapper.columnconfigure(0, weight=1); chart_wrapper.rowconfigure(0, weight=1)
-            chart_frame = self.create_card(chart_wrapper, "Revenue Trend (Last 7 Days)", row=0, col=0)
-            self.draw_dashboard_chart(chart_frame)
+            self.chart_frame = self.create_card(chart_wrapper, row=0, col=0)
+            chart_head = ttk.Frame(self.chart_frame, style='Card.TFrame'); chart_head.pack(fill="x", pady=(0, 15))
+            ttk.Label(chart_head, text="Revenue Trend", font=("Segoe UI", 12, "bold"), background=self.CARD_BG, foreground=self.TEXT_COLOR).pack(side="left")
+            self.v_chart_range = tk.StringVar(value=CONFIG.get('dashboard_range', "7 days"))
+            cb = ttk.Combobox(chart_head, textvariable=self.v_chart_range, values=list(CHART_RANGES), state="readonly", width=9); cb.pack(side="right")
+            cb.bind("<<ComboboxSelected>>", lambda e: (CONFIG.set('dashboard_range', self.v_chart_range.get()), self.update_dashboard_chart()))
+            # matplotlib loads lazily; draw after the first paint so it never delays the window
+            self.root.after_idle(lambda: self.root.after(0, self.update_dashboard_chart))
 
         self.refresh_dashboard_data()
 
-    def draw_dashboard_chart(self, parent):
-        f = plt.Figure(figsize=(5, 3), dpi=100, facecolor=self.CARD_BG)
-        ax = f.add_subplot(111)
-        daily_totals = {}
-        for h in self.history:
-            try:
-                d_str = h['date'][:10]
-                val = float(h.get('sold_for', 0))
-                daily_totals[d_str] = daily_totals.get(d_str, 0) + val
-            except: pass
-        sorted_dates = sorted(daily_totals.keys())
-        display_dates = sorted_dates[-7:] if sorted_dates else ["Today"]
-        display_vals = [daily_totals[d] for d in display_dates] if sorted_dates else [0]
-        ax.plot(display_dates, display_vals, color=self.ACCENT_COLOR, marker='o', linewidth=2, markersize=6)
-        ax.set_facecolor(self.CARD_BG)
-        ax.spines['top'].set_visible(False); ax.spines['right'].set_visible(False); ax.spines['left'].set_visible(False)
-        ax.grid(axis='y', linestyle='--', alpha=0.3)
-        ax.tick_params(axis='x', colors=self.TEXT_COLOR, rotation=45, labelsize=8) 
-        ax.tick_params(axis='y', colors=self.TEXT_COLOR)
-        for i, v in enumerate(display_vals):
-            ax.text(i, v + (max(display_vals)*0.05 if display_vals else 1), f"${int(v)}", ha='center', va='bottom', fontsize=8, color=self.TEXT_COLOR)
-        f.tight_layout()
-        canvas = FigureCanvasTkAgg(f, parent); canvas.get_tk_widget().pack(fill="both", expand=True)
+    def refresh_dashboard_page(self):
+        self.refresh_dashboard_data(); self.refresh_fleet_table(); self.update_dashboard_chart()
+
+    def fleet_row_values(self, row):
+        st = row[1]; mins = int(st.get('mc_remaining_time') or 0)
+        status = st['gcode_state'] if st['link'] == "ONLINE" else st['link']
+        if st.get('error'): status += f" - {st['error']}"
+        tray = st['ams'].get(st['tray_now']) if st['tray_now'] else None
+        return (st['name'], st.get('model', ''), status, f"{st['mc_percent']}%", f"{st['layer_num']}/{st['total_layer_num']}" if st['total_layer_num'] else "-",
+                f"{mins // 60}h {mins % 60:02d}m" if mins else "-", f"{st['nozzle_temper']:.0f}°C", f"{st['bed_temper']:.0f}°C", f"{st['fan_part']}%",
+                f"{st['tray_now']} {tray['type']}".strip() if tray else st['tray_now'] or "-", st['subtask_name'])
+
+    def refresh_fleet_table(self):
+        states = self.fleet.states()
+        if self.fleet_rows and self.fleet_rows.alive: self.fleet_rows.sync(sorted(states.items(), key=lambda r: r[1]['name'].lower()))
+        self.update_fleet_summary(states); self.update_sparklines(force=True)
+
+    def update_sparklines(self, force=False):
+        # Selected printer (else the first row); redrawn at most once a second unless the selection/range changed
+        if not self.fleet_rows or not self.fleet_rows.alive: return
+        rows = self.fleet_tree.selection() or self.fleet_tree.get_children()
+        serial = rows[0] if rows else None; rng = self.v_spark_range.get(); now = time.time()
+        key = (serial, rng, self.current_theme_name)
+        if not force and key == self.spark_key and now - self.spark_at < 1.0: return
+        self.spark_key = key; self.spark_at = now
+        tier, seconds = SPARK_RANGES.get(rng, SPARK_RANGES["1 hour"])
+        self.lbl_spark_printer.config(text=self.fleet_tree.set(serial, "Printer") if serial else "No printer selected")
+        for metric, sp in self.sparklines.items():
+            sp.set_data(self.telemetry.window(serial, metric, seconds, tier, now) if serial else [], self.CARD_BG, self.ACCENT_COLOR)
+
+    def update_fleet_summary(self, states):
+        if not hasattr(self, 'lbl_printer_status') or not self.lbl_printer_status.winfo_exists(): return
+        online = sum(1 for st in states.values() if st['link'] == "ONLINE")
+        if not states: self.lbl_printer_status.config(text="Fleet: No printers configured", foreground=self.TEXT_SECONDARY)
+        else: self.lbl_printer_status.config(text=f"Fleet: {online}/{len(states)} online", foreground=self.ACCENT_COLOR if online else self.TEXT_SECONDARY)
+
+    def update_dashboard_chart(self):
+        # The chart is created once; afterwards it is only fed new data when revenue, range, day or theme changed
+        if not HAS_MATPLOTLIB or not self.chart_frame.winfo_exists(): return
+        days = CHART_RANGES.get(self.v_chart_range.get(), 7); today = datetime.now().date()
+        key = (id(self.rollups), self.rollups.revision, self.current_theme_name, days, today)
+        if key == self.chart_key: return
+        self.chart_key = key
+        if self.revenue_chart is None: self.revenue_chart = RevenueChart(self.chart_frame)
+        self.revenue_chart.apply_theme(self.ACCENT_COLOR, self.CARD_BG, self.TEXT_COLOR)
+        self.revenue_chart.set_data(*self.rollups.revenue_series(days, today))
 
     def refresh_dashboard(self): 
-        self.load_all_data(); self.refresh_dashboard_data()
+        # Only re-read when a source file changed behind our back
+        if self.data_changed_on_disk(): self.load_all_data()
+        self.refresh_dashboard_page()
 
     def refresh_dashboard_data(self):
-        total_p = len(self.history); active_p = len(self.queue)
-        self.lbl_stat_proj.config(text=str(total_p))
+        stats = self.rollups.stats(); active_p = len(self.queue)
+        self.lbl_stat_proj.config(text=str(stats['projects']))
         self.lbl_sub_proj.config(text=f"{active_p} active in queue")
-        costs = [float(h.get('cost', 0)) for h in self.history]
-        avg_cost = sum(costs) / len(costs) if costs else 0
-        self.lbl_stat_cost.config(text=f"${avg_cost:.2f}")
+        self.lbl_stat_cost.config(text=f"${stats['avg_cost']:.2f}")
         self.lbl_sub_cost.config(text="Per finished project")
-        total_g = sum(int(i.get('weight', 0)) for i in self.inventory)
-        self.lbl_stat_inv.config(text=f"{total_g/1000:.1f} kg")
+        self.lbl_stat_inv.config(text=f"{stats['total_g']/1000:.1f} kg")
         self.lbl_sub_inv.config(text="Total filament remaining")
-        low_count = sum(1 for i in self.inventory if int(i.get('weight',0)) < 200)
-        self.lbl_stat_low.config(text=str(low_count))
+        self.lbl_stat_low.config(text=str(stats['low_count']))
         self.lbl_sub_low.config(text="Spools < 200g")
 
     # --- INVENTORY ---
     def show_inventory(self):
         self.current_page_method = self.show_inventory
-        self.clear_content()
-        form_frame = ttk.Frame(self.content_area, style='Card.TFrame', padding=15)
+        self.show_page("inventory", self.build_inventory_page, self.refresh_inventory_list)
+
+    def build_inventory_page(self, page):
+        form_frame = ttk.Frame(page, style='Card.TFrame', padding=15)
         form_frame.pack(fill="x", pady=(0, 10))
         ttk.Label(form_frame, text="Add/Edit Spool", font=("Segoe UI", 10, "bold"), background=self.CARD_BG).grid(row=0, column=0, sticky="w", padx=5)
         
@@ -502,7 +2613,7 @@ class FilamentManagerApp:
         ttk.Button(f2, text="Save Spool", style='Success.TButton', command=self.save_spool).pack(side="left", padx=15)
         ttk.Button(f2, text="Clear", style='Secondary.TButton', command=self.clear_form).pack(side="left", padx=5)
 
-        act_frame = ttk.Frame(self.content_area); act_frame.pack(fill="x", pady=5)
+        act_frame = ttk.Frame(page); act_frame.pack(fill="x", pady=5)
         ttk.Button(act_frame, text="Edit Selected", style='Primary.TButton', command=self.edit_selected).pack(side="left", padx=2)
         ttk.Button(act_frame, text="Set Material", style='Primary.TButton', command=self.bulk_set_material).pack(side="left", padx=2)
         ttk.Button(act_frame, text="Delete", style='Danger.TButton', command=self.delete_spool).pack(side="left", padx=2)
@@ -512,10 +2623,11 @@ class FilamentManagerApp:
 
         ttk.Label(act_frame, text="🔍 Filter:", background=self.BG_COLOR).pack(side="left", padx=(20, 5))
         self.entry_search = ttk.Entry(act_frame); self.entry_search.pack(side="left", fill="x", expand=True)
-        self.entry_search.bind("<KeyRelease>", self.filter_inventory)
+        self.entry_search.bind("<KeyRelease>", self.schedule_inventory_filter)
+        ToolTip(self.entry_search, text="Filter by text, or by field: material:petg color:black ams:a1 type:abrasive weight<200 cost>=20")
 
         cols = ("ID", "Name", "Material", "Color", "Weight", "AMS", "Cost", "Benchy", "Type")
-        self.tree = ttk.Treeview(self.content_area, columns=cols, show="tree headings", height=15)
+        self.tree = ttk.Treeview(page, columns=cols, show="tree headings", height=15)
         self.tree.column("#0", width=40, anchor="center"); self.tree.heading("#0", text="Icon")
         self.tree.column("ID", width=40, anchor="center")
         self.tree.column("Name", width=180, anchor="w")
@@ -528,25 +2640,23 @@ class FilamentManagerApp:
         self.tree.column("Type", width=70, anchor="center")
         for c in cols: self.tree.heading(c, text=c)
         self.tree.pack(fill="both", expand=True, pady=5)
+        self.inv_rows = TreeBinding(self.tree, lambda s: s.id, self.spool_row_values, lambda s: self.color_manager.get_icon(s.color, is_abrasive=s.abrasive))
         self.refresh_inventory_list()
 
     def export_inventory_to_csv(self):
         fpath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")], title="Export Inventory")
         if not fpath: return
-        try:
+        # Rows are snapshotted here; only the file write happens on the worker
+        rows = [[item.id, item.name, item.material, item.color, item.weight, item.ams_slot, item.cost, item.benchy, item.benchy_nozzle, item.abrasive] for item in self.inventory]
+        def write():
             with open(fpath, 'w', newline='', encoding='utf-8') as csvfile:
                 writer = csv.writer(csvfile)
                 writer.writerow(["ID", "Name", "Material", "Color", "Weight", "AMS", "Cost", "Benchy", "Benchy Nozzle", "Abrasive"])
-                for item in self.inventory:
-                    writer.writerow([item.get('id',''), item.get('name',''), item.get('material',''), item.get('color',''), item.get('weight',0), item.get('ams_slot','External'), item.get('cost',0), item.get('benchy','❌'), item.get('benchy_nozzle', ''), item.get('abrasive','No')])
-            messagebox.showinfo("Success", f"Exported to {fpath}")
-        except Exception as e: messagebox.showerror("Error", str(e))
+                writer.writerows(rows)
+        TASKS.submit(write, key=("export", fpath), on_done=lambda _: messagebox.showinfo("Success", f"Exported to {fpath}"), on_error=lambda e: messagebox.showerror("Error", str(e)))
 
     def auto_gen_id(self):
-        next_id = 1
-        existing = [int(i['id']) for i in self.inventory if str(i['id']).isdigit()]
-        if existing: next_id = max(existing) + 1
-        self.v_id.set(str(next_id).zfill(3))
+        self.v_id.set(self.inventory.next_id())
 
     def clear_form(self):
         self.v_brand.set(""); self.v_color.set(""); self.v_id.set(""); self.v_weight.set("1000"); self.v_cost.set("20.00"); self.v_ams_slot.set("External"); self.v_abrasive.set(False); self.v_benchy.set(False); self.v_benchy_nozzle.set("0.4mm")
@@ -573,71 +2683,80 @@ class FilamentManagerApp:
     def bulk_set_material(self):
         mat = simpledialog.askstring("Bulk Update", "Enter Material:")
         if mat:
-            for item_id in self.tree.selection():
-                val = self.tree.item(item_id)['values']; spool_id = str(val[0])
-                for i in self.inventory:
-                    if str(i.get('id')) == spool_id: i['material'] = mat
-            self.save_json(self.inventory, DB_FILE); self.refresh_inventory_list()
+            with self.store.batch(), self.inv_rows.batch():
+                for item_id in self.tree.selection():
+                    spool = self.inventory.get(normalize_spool_id(self.tree.item(item_id)['values'][0]))
+                    if spool: spool.material = mat; self.persist_spool(spool)
+            self.refilter_inventory()
 
     def toggle_benchy(self):
         sel = self.tree.selection()
         if not sel: return
-        val = self.tree.item(sel[0])['values']; spool_id = str(val[0])
-        for item in self.inventory:
-            if str(item.get('id')) == spool_id:
-                curr = item.get('benchy','❌')
-                if curr == '❌': item['benchy'] = '✅'; item['benchy_nozzle'] = '0.4mm' # Default if quick-toggled
-                else: item['benchy'] = '❌'
-                break
-        self.save_json(self.inventory, DB_FILE); self.refresh_inventory_list()
+        item = self.inventory.get(normalize_spool_id(self.tree.item(sel[0])['values'][0]))
+        if not item: return
+        if item.benchy == '❌': item.benchy = '✅'; item.benchy_nozzle = '0.4mm' # Default if quick-toggled
+        else: item.benchy = '❌'
+        self.persist_spool(item)
+        self.refilter_inventory()
 
     def delete_spool(self):
         sel = self.tree.selection()
         if not sel: return
-        val = self.tree.item(sel[0])['values']; spool_id = str(val[0])
+        val = self.tree.item(sel[0])['values']; spool_id = normalize_spool_id(val[0])
         if messagebox.askyesno("Confirm", f"Delete Spool {spool_id}?"):
-            self.inventory = [i for i in self.inventory if str(i.get('id')) != spool_id]
-            self.save_json(self.inventory, DB_FILE); self.refresh_inventory_list()
-
-    def filter_inventory(self, event):
-        query = self.entry_search.get().lower()
-        for item in self.tree.get_children(): self.tree.delete(item)
+            self.inventory.remove(spool_id)
+            self.store.delete_spool(spool_id); self.rollups.remove_spool(spool_id); self.search_index.remove(spool_id); self.inv_rows.remove(spool_id)
+
+    def schedule_inventory_filter(self, event=None):
+        # Debounced: a burst of keystrokes only filters once typing pauses
+        if self._filter_after: self.root.after_cancel(self._filter_after)
+        self._filter_after = self.root.after(150, self.filter_inventory)
+
+    def refilter_inventory(self):
+        # An edited spool may now match (or stop matching) the active filter
+        if self.entry_search.get().strip(): self.filter_inventory()
+
+    def filter_inventory(self, event=None):
+        self._filter_after = None
+        if not self.tree.winfo_exists(): return
+        matches = self.search_index.search(self.entry_search.get())
+        # Rows stay in the tree; non-matches are detached and matches re-attached in inventory order
+        hidden = [i.id for i in self.inventory if matches is not None and i.id not in matches and self.tree.exists(i.id)]
+        if hidden: self.tree.detach(*hidden)
+        attached = set(self.tree.get_children())
+        pos = 0
         for item in self.inventory:
-            if query in str(item).lower():
-                self.insert_tree_item(item)
+            if matches is not None and item.id not in matches: continue
+            if item.id not in attached and self.tree.exists(item.id): self.tree.move(item.id, "", pos)
+            pos += 1
 
     def save_spool(self):
         try:
             sid = self.v_id.get(); 
             if not sid: self.auto_gen_id(); sid = self.v_id.get()
-            item = {
-                "id": sid, "name": self.v_brand.get(), "material": self.v_mat.get(), "color": self.v_color.get(), 
-                "weight": float(self.v_weight.get()), "cost": float(self.v_cost.get()), 
-                "benchy": "✅" if self.v_benchy.get() else "❌", "benchy_nozzle": self.v_benchy_nozzle.get(),
-                "ams_slot": self.v_ams_slot.get(), "abrasive": self.v_abrasive.get()
-            }
-            self.inventory = [i for i in self.inventory if str(i.get('id')) != sid]
-            self.inventory.append(item)
-            self.inventory.sort(key=lambda x: int(x['id']) if str(x['id']).isdigit() else 9999)
-            self.save_json(self.inventory, DB_FILE); self.refresh_inventory_list(); self.clear_form(); messagebox.showinfo("Success", "Spool Saved")
+            sid = normalize_spool_id(sid)
+            old = self.inventory.get(sid)
+            item = Spool(sid, self.v_brand.get(), self.v_mat.get(), self.v_color.get(), float(self.v_weight.get()), float(self.v_cost.get()),
+                         "✅" if self.v_benchy.get() else "❌", self.v_benchy_nozzle.get(), self.v_ams_slot.get(), self.v_abrasive.get(), old.extra if old else None)
+            self.inventory.put(item); self.persist_spool(item)
+            if not old and self.entry_search.get().strip(): self.tree.detach(item.id) # Let the filter place it among the visible rows
+            self.refilter_inventory()
+            self.clear_form(); messagebox.showinfo("Success", "Spool Saved")
         except: messagebox.showerror("Error", "Check numeric fields")
 
     def refresh_inventory_list(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        for item in self.inventory: self.insert_tree_item(item)
-
-    def insert_tree_item(self, item):
-        w = int(item.get('weight', 0)); c = float(item.get('cost', 0))
-        is_abr = item.get('abrasive', False)
-        icon = self.color_manager.get_icon(item.get('color', ''), is_abrasive=is_abr)
-        type_str = "⚠️ ABRASIVE" if is_abr else "Standard"
+        self.inv_rows.sync(self.inventory)
+        self.refilter_inventory()
+
+    def spool_row_values(self, item):
+        type_str = "⚠️ ABRASIVE" if item.abrasive else "Standard"
         
         # Format Benchy String
-        benchy_display = item.get('benchy', '❌')
+        benchy_display = item.benchy
         if benchy_display == '✅':
-            benchy_display += f" ({item.get('benchy_nozzle', '0.4mm')})"
+            benchy_display += f" ({item.benchy_nozzle})"
             
-        self.tree.insert("", "end", image=icon, values=(item.get('id', '?'), item.get('name'), item.get('material'), item.get('color'), w, item.get('ams_slot','Ext'), f"${c:.2f}", benchy_display, type_str))
+        return (item.id or '?', item.name, item.material, item.color, int(item.weight), item.ams_slot, f"${item.cost:.2f}", benchy_display, type_str)
 
     def check_price(self):
         sel = self.tree.selection()
@@ -645,10 +2764,9 @@ class FilamentManagerApp:
         val = self.tree.item(sel[0])['values']
         webbrowser.open(f"https://www.google.com/search?q={val[1]} {val[2]} {val[3]} filament price&tbm=shop")
         if self.ai_manager.api_key:
-            def run():
-                res = self.ai_manager.estimate_price(val[1], val[2], val[3])
+            def done(res):
                 if res and 'price_estimate' in res: messagebox.showinfo("AI Estimate", f"Estimated: {res['price_estimate']}")
-            threading.Thread(target=run).start()
+            TASKS.submit(self.ai_manager.estimate_price, val[1], val[2], val[3], key=("price", val[0]), on_done=done, timeout=60)
 
     def configure_ai(self):
         key = simpledialog.askstring("Google AI Studio", "Enter Gemini API Key:", initialvalue=self.ai_manager.api_key)
@@ -659,24 +2777,30 @@ class FilamentManagerApp:
     # --- AI SLICER READER ---
     def show_ai_reader(self):
         self.current_page_method = self.show_ai_reader
-        self.clear_content()
-        container = ttk.Frame(self.content_area); container.place(relx=0.5, rely=0.5, anchor="center")
+        self.show_page("ai_reader", self.build_ai_reader_page, self.refresh_ai_reader_page)
+
+    def build_ai_reader_page(self, page):
+        container = ttk.Frame(page); container.place(relx=0.5, rely=0.5, anchor="center")
         icon_lbl = ttk.Label(container, text="⛶", font=("Segoe UI", 30), foreground=self.ACCENT_COLOR, background=self.BG_COLOR); icon_lbl.pack()
         ttk.Label(container, text="AI Slicer Reader", font=("Segoe UI", 24, "bold"), foreground=self.ACCENT_COLOR).pack(pady=(0,10))
-        ttk.Label(container, text=f"Model: {self.ai_manager.preferred_model}", font=("Segoe UI", 10), foreground="gray").pack(pady=0)
+        self.lbl_ai_model = ttk.Label(container, text=f"Model: {self.ai_manager.preferred_model}", font=("Segoe UI", 10), foreground="gray"); self.lbl_ai_model.pack(pady=0)
         card = ttk.Frame(container, style='Card.TFrame', padding=40); card.pack(ipadx=20)
         self.btn_slicer_scan = ttk.Button(card, text="↥ Choose File", style='Accent.TButton', command=self.open_slicer_scanner); self.btn_slicer_scan.pack(fill="x", pady=5)
-        if not self.ai_manager.api_key: ttk.Button(container, text="⚙️ Configure API Key", style='Ghost.TButton', command=self.configure_ai).pack(pady=5)
+        self.btn_ai_configure = ttk.Button(container, text="⚙️ Configure API Key", style='Ghost.TButton', command=self.configure_ai)
+        self.refresh_ai_reader_page()
+
+    def refresh_ai_reader_page(self):
+        self.lbl_ai_model.config(text=f"Model: {self.ai_manager.preferred_model}")
+        if self.ai_manager.api_key: self.btn_ai_configure.pack_forget()
+        elif not self.btn_ai_configure.winfo_ismapped(): self.btn_ai_configure.pack(pady=5)
 
     def open_slicer_scanner(self):
         if not self.ai_manager.api_key: self.configure_ai(); return
         path = filedialog.askopenfilename()
         if not path: return
         self.btn_slicer_scan.config(text="⏳ Analyzing...", state="disabled")
-        def run():
-             res = self.ai_manager.analyze_slicer_screenshot(path)
-             self.root.after(0, lambda: self._process_slicer_results(res))
-        threading.Thread(target=run).start()
+        TASKS.submit(self.ai_manager.analyze_slicer_screenshot, path, key="slicer_scan", timeout=120,
+                     on_done=self._process_slicer_results, on_error=lambda e: self._process_slicer_results({'error': str(e)}))
 
     def _process_slicer_results(self, res):
         self.btn_slicer_scan.config(text="Upload Slicer Screenshot", state="normal")
@@ -691,9 +2815,11 @@ class FilamentManagerApp:
     # --- CALCULATOR ---
     def show_calculator(self):
         self.current_page_method = self.show_calculator
-        self.clear_content()
-        ttk.Label(self.content_area, text="Calculator", font=("Segoe UI", 20, "bold")).pack(pady=10)
-        paned = ttk.Panedwindow(self.content_area, orient=tk.HORIZONTAL); paned.pack(fill="both", expand=True)
+        self.show_page("calculator", self.build_calculator_page, self.update_filament_dropdown)
+
+    def build_calculator_page(self, page):
+        ttk.Label(page, text="Calculator", font=("Segoe UI", 20, "bold")).pack(pady=10)
+        paned = ttk.Panedwindow(page, orient=tk.HORIZONTAL); paned.pack(fill="both", expand=True)
         f_left = ttk.Frame(paned, padding=10); paned.add(f_left, weight=1)
         f_right = ttk.Frame(paned, padding=10); paned.add(f_right, weight=2)
         
@@ -779,15 +2905,21 @@ class FilamentManagerApp:
         if not txt: return
         try:
             g = float(self.entry_calc_grams.get())
-            match = re.search(r"\[(\d+)\]", txt)
-            spool = next((s for s in self.inventory if str(s.get('id')) == match.group(1)), None) if match else next((s for s in self.inventory if s['name'] in txt), None)
-            if spool:
-                cost = (spool['cost'] / 1000) * g
-                self.current_job_filaments.append({'spool': spool, 'cost': cost, 'grams': g})
-                self.list_job.insert(tk.END, f"{spool['name']} ({spool.get('material','?')}): {g}g (${cost:.2f})")
-                self.entry_calc_grams.delete(0, tk.END); self.combo_filaments.set('')
+            spool = self.resolve_spool_text(txt)
+            if not spool: messagebox.showerror("Error", f"No spool matches '{txt}'."); return
+            cost = (spool.cost / 1000) * g
+            self.current_job_filaments.append({'spool': spool, 'cost': cost, 'grams': g})
+            self.list_job.insert(tk.END, f"{spool.name} ({spool.material or '?'}): {g}g (${cost:.2f})")
+            self.entry_calc_grams.delete(0, tk.END); self.combo_filaments.set('')
         except: pass
 
+    def resolve_spool_text(self, txt):
+        # Picked label, any text carrying an [id], a typed ID, then the first spool whose name appears in the text
+        sid = self.filament_choices.get(txt)
+        if sid is None:
+            m = re.search(r"\[([^\]]+)\]", txt); sid = normalize_spool_id(m.group(1) if m else txt)
+        return self.inventory.get(sid) or next((s for s in self.inventory if s.name and s.name in txt), None)
+
     def clear_job(self):
         self.current_job_filaments = []; self.list_job.delete(0, tk.END); self.lbl_breakdown.config(text="...")
         for b in [self.btn_receipt, self.btn_queue, self.btn_deduct, self.btn_fail]: b.config(state="disabled")
@@ -806,14 +2938,30 @@ class FilamentManagerApp:
         job = {"job": self.entry_job_name.get(), "date_added": datetime.now().strftime("%Y-%m-%d"), "items": self.current_job_filaments, "params": {
             "hours": self.entry_hours.get(), "rate": self.entry_mach_rate.get(), "labor": self.entry_processing.get(), "markup": self.entry_markup.get(), "swaps": self.entry_swaps.get(), "swap_fee": self.entry_swap_fee.get(), "batch": self.entry_batch_qty.get(), "nozzle": self.v_nozzle.get()
         }}
-        self.queue.append(job); self.save_json(self.queue, QUEUE_FILE); self.clear_job(); messagebox.showinfo("Success", "Queued.")
+        job['id'] = uuid.uuid4().hex[:12]
+        self.queue.append(job); self.store.save_queue(); self.clear_job(); messagebox.showinfo("Success", "Queued.")
+
+    def job_orphans(self):
+        # Job segments whose spool was deleted after it was added; their grams can't come off any inventory row
+        return [i for i in self.current_job_filaments if self.inventory.get(i['spool'].id) is not i['spool']]
+
+    def confirm_orphans(self, orphans):
+        if not orphans: return True
+        lines = "\n".join(f"[{i['spool'].id}] {i['spool'].name}: {i['grams']}g" for i in orphans)
+        return messagebox.askyesno("Deleted Spools", f"These spools were deleted, so their usage can't be deducted:\n{lines}\n\nLog the job anyway? The history entry will record the undeducted usage.")
+
+    @staticmethod
+    def orphan_extra(orphans):
+        return {"undeducted": [{"spool": i['spool'].id, "name": i['spool'].name, "grams": i['grams']} for i in orphans]} if orphans else None
 
     def deduct_inventory(self):
         if messagebox.askyesno("Confirm", "Deduct?"):
-            for item in self.current_job_filaments: item['spool']['weight'] -= item['grams']
-            self.save_json(self.inventory, DB_FILE)
-            self.history.append({"date": datetime.now().strftime("%Y-%m-%d"), "job": self.entry_job_name.get(), "sold_for": self.calc_vals['total'], "profit": self.calc_vals['profit'], "cost": self.calc_vals['subtotal']})
-            self.save_json(self.history, HISTORY_FILE); self.clear_job()
+            orphans = self.job_orphans()
+            if not self.confirm_orphans(orphans): return
+            with self.store.batch():
+                for item in self.current_job_filaments: item['spool'].weight -= item['grams']; self.persist_spool(item['spool'])
+            entry = HistoryEntry(datetime.now().strftime("%Y-%m-%d"), self.entry_job_name.get(), self.calc_vals['total'], self.calc_vals['subtotal'], self.calc_vals['profit'], self.orphan_extra(orphans))
+            self.append_history(entry); self.clear_job()
 
     def log_failure(self):
         if not self.current_job_filaments: return
@@ -821,34 +2969,40 @@ class FilamentManagerApp:
         if not reason: return
         
         if messagebox.askyesno("Confirm Failure", f"Deduct {len(self.current_job_filaments)} spools as WASTE?\n(Revenue will be $0.00)"):
+            orphans = self.job_orphans()
+            if not self.confirm_orphans(orphans): return
             # 1. Deduct Inventory
-            for item in self.current_job_filaments:
-                item['spool']['weight'] -= item['grams']
-            self.save_json(self.inventory, DB_FILE)
+            with self.store.batch():
+                for item in self.current_job_filaments:
+                    item['spool'].weight -= item['grams']
+                    self.persist_spool(item['spool'])
             
             # 2. Add to History as a LOSS
-            fail_entry = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "job": f"FAILED: {self.entry_job_name.get()} ({reason})",
-                "sold_for": 0.00,
-                "profit": -self.calc_vals['subtotal'], # Negative profit
-                "cost": self.calc_vals['subtotal']
-            }
-            self.history.append(fail_entry)
-            self.save_json(self.history, HISTORY_FILE)
+            fail_entry = HistoryEntry(
+                date=datetime.now().strftime("%Y-%m-%d"),
+                job=f"FAILED: {self.entry_job_name.get()} ({reason})",
+                sold_for=0.00,
+                profit=-self.calc_vals['subtotal'], # Negative profit
+                cost=self.calc_vals['subtotal'],
+                extra=self.orphan_extra(orphans)
+            )
+            self.append_history(fail_entry)
             self.clear_job()
             self.refresh_dashboard_data()
             messagebox.showinfo("Logged", "Failure logged. Inventory deducted.")
 
     # --- RESTORED HELPERS (With Video Support) ---
     def update_filament_dropdown(self):
-        self.full_filament_list = [f"[{i.get('id','?')}] {i['name']} - {i.get('material','?')} - {i.get('color','')}" for i in self.inventory]
+        self.filament_choices = {i.label: i.id for i in self.inventory}
+        self.full_filament_list = list(self.filament_choices)
         self.combo_filaments['values'] = self.full_filament_list
 
     def show_reference(self):
-        self.current_page_method = self.show_reference; self.clear_content()
-        ttk.Label(self.content_area, text="Reference Library", font=("Segoe UI", 20, "bold")).pack(pady=(0,20))
-        self.gallery_notebook = ttk.Notebook(self.content_area); self.gallery_notebook.pack(fill="both", expand=True)
+        self.current_page_method = self.show_reference; self.show_page("reference", self.build_reference_page)
+
+    def build_reference_page(self, page):
+        ttk.Label(page, text="Reference Library", font=("Segoe UI", 20, "bold")).pack(pady=(0,20))
+        self.gallery_notebook = ttk.Notebook(page); self.gallery_notebook.pack(fill="both", expand=True)
         self.build_wiki_tabs(); self.build_dynamic_gallery_tabs(); self.build_manual_tab()
 
     def build_dynamic_gallery_tabs(self):
@@ -866,28 +3020,72 @@ class FilamentManagerApp:
                     ttk.Label(tab_frame, text="🎥 Video Content", font=("Segoe UI", 20)).pack(pady=50)
                     ttk.Button(tab_frame, text="▶️ Watch Video", style='Success.TButton', command=lambda p=fpath: os.startfile(p)).pack()
                 else:
-                    pil = Image.open(fpath); pil.thumbnail((1000, 600)); tk_img = ImageTk.PhotoImage(pil); self.ref_images_cache.append(tk_img)
-                    lbl = ttk.Label(tab_frame, image=tk_img, cursor="hand2"); lbl.pack(expand=True)
+                    # Decoded on a worker the first time the tab is selected
+                    lbl = ttk.Label(tab_frame, text="⏳ Loading...", cursor="hand2"); lbl.pack(expand=True)
                     lbl.bind("<Button-1>", lambda e, p=fpath: self.view_full_image(p))
                     ttk.Label(tab_frame, text="(Click to Zoom)", font=("Segoe UI", 8), foreground="gray").pack(pady=5)
+                    self.gallery_tabs[str(tab_frame)] = {"path": fpath, "label": lbl, "state": None}
             except: pass
+        self.gallery_notebook.bind("<<NotebookTabChanged>>", self.on_gallery_tab_changed)
+        images = [t["path"] for t in self.gallery_tabs.values()]
+        TASKS.submit(self.thumbnails.prune, images, key="thumb_prune")
+        TASKS.submit(ImagePyramid.prune, images, key="tile_prune")
+
+    GALLERY_LIVE_IMAGES = 4
+
+    def on_gallery_tab_changed(self, event=None):
+        tab = self.gallery_tabs.get(self.gallery_notebook.select())
+        if not tab: return
+        if tab["state"] == "loaded": self.gallery_images.move_to_end(tab["path"]); return
+        if tab["state"] == "loading": return
+        tab["state"] = "loading"
+        TASKS.submit(self.thumbnails.load, tab["path"], key=("thumb", tab["path"]),
+                     on_done=lambda pil: self._show_gallery_image(tab, pil), on_error=lambda e: self._show_gallery_image(tab, None))
+
+    def _show_gallery_image(self, tab, pil):
+        if not tab["label"].winfo_exists(): return
+        if pil is None: tab["state"] = None; tab["label"].config(text="⚠️ Could not load image"); return
+        tk_img = ImageTk.PhotoImage(pil); tab["label"].config(image=tk_img, text=""); tab["state"] = "loaded"
+        self.gallery_images[tab["path"]] = tk_img
+        # Only a few PhotoImages stay live; an evicted tab reloads (from the thumbnail cache) when revisited
+        while len(self.gallery_images) > self.GALLERY_LIVE_IMAGES:
+            path, _ = self.gallery_images.popitem(last=False)
+            for t in self.gallery_tabs.values():
+                if t["path"] == path and t["label"].winfo_exists(): t["label"].config(image="", text="⏳ Loading..."); t["state"] = None
 
     def view_full_image(self, img_path):
-        top = tk.Toplevel(self.root); top.title(f"Zoom: {os.path.basename(img_path)}"); top.state('zoomed')
-        canvas = tk.Canvas(top, bg="black"); v_scroll = ttk.Scrollbar(top, orient="vertical", command=canvas.yview); h_scroll = ttk.Scrollbar(top, orient="horizontal", command=canvas.xview)
-        canvas.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
-        v_scroll.pack(side="right", fill="y"); h_scroll.pack(side="bottom", fill="x"); canvas.pack(side="left", fill="both", expand=True)
-        pil = Image.open(img_path); tk_full = ImageTk.PhotoImage(pil); canvas.image = tk_full 
-        canvas.create_image(0, 0, image=tk_full, anchor="nw"); canvas.config(scrollregion=canvas.bbox("all"))
+        TiledImageViewer(self.root, img_path)
 
     # --- MISSING FUNCTIONS RESTORED ---
     def configure_printer(self):
-        d = tk.Toplevel(self.root); d.title("Settings"); d.geometry("400x450")
+        d = tk.Toplevel(self.root); d.title("Settings"); d.geometry("480x640")
         ttk.Label(d, text="Settings", font=("Segoe UI", 12, "bold")).pack(pady=10)
         f = ttk.Frame(d, padding=20); f.pack(fill="x")
-        ttk.Label(f, text="Printer IP:").pack(anchor="w"); e_ip = ttk.Entry(f); e_ip.pack(fill="x"); e_ip.insert(0, self.printer_cfg.get('ip',''))
-        ttk.Label(f, text="Access Code:").pack(anchor="w"); e_ac = ttk.Entry(f); e_ac.pack(fill="x"); e_ac.insert(0, self.printer_cfg.get('access_code',''))
-        ttk.Label(f, text="Serial:").pack(anchor="w"); e_sn = ttk.Entry(f); e_sn.pack(fill="x"); e_sn.insert(0, self.printer_cfg.get('serial',''))
+        fleet = CONFIG.printers
+        ttk.Label(f, text="Printers:").pack(anchor="w")
+        ptree = ttk.Treeview(f, columns=("Name", "Model", "IP", "Serial"), show="headings", height=4)
+        for c in ("Name", "Model", "IP", "Serial"): ptree.heading(c, text=c); ptree.column(c, width=100)
+        ptree.pack(fill="x")
+        def refresh_printers():
+            ptree.delete(*ptree.get_children())
+            for p in fleet: ptree.insert("", "end", values=(p.get('name', ''), p.get('model', ''), p.get('ip', ''), p.get('serial', '')))
+        def edit_printer(idx=None):
+            def done(cfg):
+                if idx is None: fleet.append(cfg)
+                else: fleet[idx] = cfg
+                refresh_printers()
+            self.edit_printer_dialog(d, fleet[idx] if idx is not None else {}, done)
+        def selected_index():
+            sel = ptree.selection(); return ptree.index(sel[0]) if sel else None
+        def remove_printer():
+            idx = selected_index()
+            if idx is not None: fleet.pop(idx); refresh_printers()
+        pbar = ttk.Frame(f); pbar.pack(fill="x", pady=(5, 10))
+        ttk.Button(pbar, text="➕ Add", style="Secondary.TButton", command=edit_printer).pack(side="left")
+        ttk.Button(pbar, text="✏️ Edit", style="Secondary.TButton", command=lambda: selected_index() is not None and edit_printer(selected_index())).pack(side="left", padx=5)
+        ttk.Button(pbar, text="❌ Remove", style="Danger.TButton", command=remove_printer).pack(side="right")
+        ptree.bind("<Double-1>", lambda e: selected_index() is not None and edit_printer(selected_index()))
+        refresh_printers()
         ttk.Label(f, text="AI Key:").pack(anchor="w"); e_ai = ttk.Entry(f, show="*"); e_ai.pack(fill="x"); e_ai.insert(0, self.ai_manager.api_key)
         
         lbl_model = ttk.Label(f, text=f"Current Model: {self.ai_manager.preferred_model}", font=("Segoe UI", 8), foreground="gray")
@@ -896,26 +3094,48 @@ class FilamentManagerApp:
         def run_diagnostic():
             key = e_ai.get()
             if not key: messagebox.showerror("Error", "Enter Key First"); return
-            genai.configure(api_key=key)
-            try:
-                models = [m.name.replace("models/", "") for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-                if not models: messagebox.showwarning("Warning", "No compatible models found."); return
+            if not HAS_GENAI: messagebox.showerror("Error", "google-generativeai is not installed."); return
+            def fetch():
+                genai.configure(api_key=key)
+                return [m.name.replace("models/", "") for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+            def failed(e):
+                if d.winfo_exists(): btn_diag.config(text="🔍 Test AI & List Models", state="normal"); messagebox.showerror("Error", str(e), parent=d)
+            def done(models):
+                if not d.winfo_exists(): return
+                btn_diag.config(text="🔍 Test AI & List Models", state="normal")
+                if not models: messagebox.showwarning("Warning", "No compatible models found.", parent=d); return
                 diag = tk.Toplevel(d); diag.title("Select Model")
                 ttk.Label(diag, text="Select model:", padding=10).pack()
                 box = ttk.Combobox(diag, values=models, state="readonly"); box.pack(padx=20, pady=10); box.current(0)
                 def confirm():
                     self.ai_manager.save_config(key, box.get()); lbl_model.config(text=f"Selected: {box.get()}"); diag.destroy()
                 ttk.Button(diag, text="Use Selected", command=confirm).pack(pady=10)
-            except Exception as e: messagebox.showerror("Error", str(e))
+            btn_diag.config(text="⏳ Contacting Gemini...", state="disabled")
+            TASKS.submit(fetch, key="ai_models", on_done=done, on_error=failed, timeout=30)
 
-        ttk.Button(f, text="🔍 Test AI & List Models", style="Secondary.TButton", command=run_diagnostic).pack(fill="x", pady=5)
+        btn_diag = ttk.Button(f, text="🔍 Test AI & List Models", style="Secondary.TButton", command=run_diagnostic); btn_diag.pack(fill="x", pady=5)
+        ttk.Button(f, text="🗂️ Restore Backup...", style="Secondary.TButton", command=lambda: self.restore_backup(d)).pack(fill="x", pady=5)
         
         def save():
-            self.save_printer_config(e_ip.get(), e_ac.get(), e_sn.get(), True, "local", "")
+            self.save_printer_config(fleet, bool(fleet)); self.start_printer_listener()
             if e_ai.get() != self.ai_manager.api_key: self.ai_manager.save_config(e_ai.get(), self.ai_manager.preferred_model)
             d.destroy()
         ttk.Button(f, text="Save & Close", style='Accent.TButton', command=save).pack(pady=20)
 
+    def edit_printer_dialog(self, parent, cfg, on_save):
+        d = tk.Toplevel(parent); d.title("Printer"); d.transient(parent)
+        f = ttk.Frame(d, padding=20); f.pack(fill="both")
+        entries = {}
+        for key, label in (("name", "Name:"), ("ip", "IP:"), ("access_code", "Access Code:"), ("serial", "Serial:")):
+            ttk.Label(f, text=label).pack(anchor="w"); e = ttk.Entry(f, width=36); e.pack(fill="x"); e.insert(0, cfg.get(key, '')); entries[key] = e
+        ttk.Label(f, text="Model:").pack(anchor="w")
+        v_model = tk.StringVar(value=cfg.get('model', PRINTER_MODELS[0])); ttk.Combobox(f, textvariable=v_model, values=PRINTER_MODELS).pack(fill="x")
+        def save():
+            new = {k: e.get().strip() for k, e in entries.items()}; new['model'] = v_model.get().strip()
+            if not new['serial'] or not new['access_code']: messagebox.showerror("Error", "Serial and Access Code are required", parent=d); return
+            new['name'] = new['name'] or new['serial']; on_save(new); d.destroy()
+        ttk.Button(f, text="Save", style='Accent.TButton', command=save).pack(pady=(15, 0))
+
     # --- MAINTENANCE (UPDATED FOR FLEET) ---
     def init_default_maintenance(self):
         self.maintenance = [
@@ -926,7 +3146,7 @@ class FilamentManagerApp:
             {"task": "AMS 2: Replace Desiccant", "freq": "Monthly", "last": "Never"},
             {"task": "Wash Textured PEI (Dish Soap)", "freq": "Weekly", "last": "Never"}
         ]
-        self.save_json(self.maintenance, MAINT_FILE)
+        self.store.save_maintenance()
 
     def init_materials_data(self):
         self.materials_data = {
@@ -945,32 +3165,118 @@ class FilamentManagerApp:
     def init_resource_links(self): 
         self.resource_links = {"PLA": "https://all3dp.com", "Bambu": "https://wiki.bambulab.com"}
 
+    def persist_spool(self, spool):
+        # Every spool mutation lands here: storage, rollups, search index and the visible row. New spools are added
+        # with inventory.put() first; one no longer in the inventory is never written back (job deductions check
+        # job_orphans() first so the user is told and the history entry records the usage).
+        if self.inventory.get(spool.id) is not spool: return
+        self.store.upsert_spool(spool); self.rollups.set_spool(spool); self.search_index.add(spool)
+        if self.inv_rows: self.inv_rows.put(spool, self.inventory.position(spool.id))
+
+    def append_history(self, entry):
+        self.history.append(entry); self.store.append_history(entry); self.rollups.add_history(entry)
+        if self.history_columns is not None: self.history_columns.append(entry)
+
+    # --- REPORTS ---
+    def show_reports(self):
+        self.current_page_method = self.show_reports; self.show_page("reports", self.build_reports_page, self.refresh_reports if HAS_NUMPY else None)
+
+    def build_reports_page(self, page):
+        ttk.Label(page, text="Reports", font=("Segoe UI", 20, "bold")).pack(pady=(0, 20))
+        if not HAS_NUMPY:
+            ttk.Label(page, text="Reports require NumPy (pip install numpy).", foreground=self.TEXT_SECONDARY).pack(); return
+        bar = ttk.Frame(page); bar.pack(fill="x", pady=(0, 10))
+        ttk.Label(bar, text="Period:").pack(side="left")
+        self.v_report_period = tk.StringVar(value="Monthly")
+        cb = ttk.Combobox(bar, textvariable=self.v_report_period, values=list(REPORT_PERIODS), state="readonly", width=10); cb.pack(side="left", padx=5)
+        cb.bind("<<ComboboxSelected>>", lambda e: self.refresh_reports())
+        ttk.Label(bar, text="From (YYYY-MM-DD):").pack(side="left", padx=(15, 0)); self.entry_report_from = ttk.Entry(bar, width=12); self.entry_report_from.pack(side="left", padx=5)
+        ttk.Label(bar, text="To:").pack(side="left"); self.entry_report_to = ttk.Entry(bar, width=12); self.entry_report_to.pack(side="left", padx=5)
+        ttk.Button(bar, text="Apply", style='Primary.TButton', command=self.refresh_reports).pack(side="left", padx=10)
+        self.lbl_report_total = ttk.Label(bar, text="", foreground=self.TEXT_SECONDARY); self.lbl_report_total.pack(side="right")
+
+        paned = ttk.Panedwindow(page, orient=tk.VERTICAL); paned.pack(fill="both", expand=True)
+        f_pnl = ttk.Labelframe(paned, text="Profit & Loss by Period", padding=5); paned.add(f_pnl, weight=3)
+        cols = ("Period", "Jobs", "Revenue", "Cost", "Profit", "Margin", "Failure Cost")
+        self.report_tree = ttk.Treeview(f_pnl, columns=cols, show="headings")
+        for c in cols: self.report_tree.heading(c, text=c); self.report_tree.column(c, anchor="center", width=110)
+        sb = ttk.Scrollbar(f_pnl, orient="vertical", command=self.report_tree.yview); self.report_tree.configure(yscrollcommand=sb.set)
+        sb.pack(side="right", fill="y"); self.report_tree.pack(fill="both", expand=True)
+        f_fail = ttk.Labelframe(paned, text="Failures by Reason", padding=5); paned.add(f_fail, weight=1)
+        self.fail_tree = ttk.Treeview(f_fail, columns=("Reason", "Count", "Cost"), show="headings", height=6)
+        for c in ("Reason", "Count", "Cost"): self.fail_tree.heading(c, text=c); self.fail_tree.column(c, anchor="center")
+        self.fail_tree.pack(fill="both", expand=True)
+        self.refresh_reports()
+
+    def refresh_reports(self):
+        if self.history_columns is None: self.history_columns = HistoryColumns.build(self.history)
+        start = self.entry_report_from.get().strip() or None; end = self.entry_report_to.get().strip() or None
+        try:
+            pnl = self.history_columns.pnl(REPORT_PERIODS[self.v_report_period.get()], start, end)
+            fails = self.history_columns.failures_by_reason(start, end)
+        except ValueError: messagebox.showerror("Error", "Dates must be YYYY-MM-DD"); return
+        self.report_tree.delete(*self.report_tree.get_children())
+        for i in range(len(pnl['period']) - 1, -1, -1):
+            self.report_tree.insert("", "end", values=(pnl['period'][i], int(pnl['count'][i]), f"${pnl['revenue'][i]:,.2f}", f"${pnl['cost'][i]:,.2f}", f"${pnl['profit'][i]:,.2f}", f"{pnl['margin'][i]:.1f}%", f"${pnl['failure_cost'][i]:,.2f}"))
+        self.fail_tree.delete(*self.fail_tree.get_children())
+        for reason, count, cost in fails: self.fail_tree.insert("", "end", values=(reason, count, f"${cost:,.2f}"))
+        rev = float(pnl['revenue'].sum()); prof = float(pnl['profit'].sum())
+        self.lbl_report_total.config(text=f"Revenue ${rev:,.2f} | Profit ${prof:,.2f} | {int(pnl['count'].sum())} jobs")
+
     # --- REINSERTING MISSING METHODS TO ENSURE COMPLETE SCRIPT ---
     def show_history(self): 
-        self.current_page_method = self.show_history; self.clear_content(); ttk.Label(self.content_area, text="Projects History", font=("Segoe UI", 20, "bold")).pack(pady=(0,20))
-        cols = ("Date", "Job", "Cost", "Price", "Profit"); self.hist_tree = ttk.Treeview(self.content_area, columns=cols, show="headings"); self.hist_tree.pack(fill="both", expand=True)
-        for c in cols: self.hist_tree.heading(c, text=c)
-        self.refresh_history_list()
-    
+        self.current_page_method = self.show_history; self.show_page("history", self.build_history_page, self.refresh_history_list)
+
+    def build_history_page(self, page):
+        ttk.Label(page, text="Projects History", font=("Segoe UI", 20, "bold")).pack(pady=(0,20))
+        bar = ttk.Frame(page); bar.pack(fill="x", pady=(0, 10))
+        ttk.Label(bar, text="From (YYYY-MM-DD):").pack(side="left"); self.entry_hist_from = ttk.Entry(bar, width=12); self.entry_hist_from.pack(side="left", padx=5)
+        ttk.Label(bar, text="To:").pack(side="left", padx=(10, 0)); self.entry_hist_to = ttk.Entry(bar, width=12); self.entry_hist_to.pack(side="left", padx=5)
+        ttk.Label(bar, text="Job:").pack(side="left", padx=(10, 0)); self.entry_hist_job = ttk.Entry(bar, width=25); self.entry_hist_job.pack(side="left", padx=5)
+        for e in (self.entry_hist_from, self.entry_hist_to, self.entry_hist_job): e.bind("<Return>", lambda e: self.refresh_history_list())
+        ttk.Button(bar, text="Apply", style='Primary.TButton', command=self.refresh_history_list).pack(side="left", padx=10)
+        self.lbl_hist_count = ttk.Label(bar, text="", foreground=self.TEXT_SECONDARY); self.lbl_hist_count.pack(side="right")
+        body = ttk.Frame(page); body.pack(fill="both", expand=True)
+        cols = ("Date", "Job", "Cost", "Price", "Profit"); self.hist_tree = ttk.Treeview(body, columns=cols, show="headings")
+        sb = ttk.Scrollbar(body, orient="vertical"); sb.pack(side="right", fill="y"); self.hist_tree.pack(fill="both", expand=True)
+        for c in cols: self.hist_tree.heading(c, text=c, command=lambda c=c: self.sort_history(c))
+        def row(i):
+            h = self.history_query[i]
+            return (h.date, h.job, f"${h.cost:.2f}", f"${h.sold_for:.2f}", f"${h.profit:.2f}")
+        self.history_query = HistoryQuery(self.history); self.hist_view = VirtualTree(self.hist_tree, sb, row)
+        self.hist_tree.after_idle(self.refresh_history_list) # After layout, so the pool matches the visible height
+
+    def sort_history(self, column):
+        self.history_query.set_sort(column); self.refresh_history_list()
+
     def refresh_history_list(self):
-        for i in self.hist_tree.get_children(): self.hist_tree.delete(i)
-        for h in self.history: self.hist_tree.insert("", "end", values=(h.get('date'), h.get('job'), f"${float(h.get('cost',0)):.2f}", f"${float(h.get('sold_for',0)):.2f}", f"${float(h.get('profit',0)):.2f}"))
+        q = self.history_query
+        try: q.set_filter(self.entry_hist_from.get().strip(), self.entry_hist_to.get().strip(), self.entry_hist_job.get())
+        except ValueError: messagebox.showerror("Error", "Dates must be YYYY-MM-DD"); return
+        q.history = self.history; count = q.refresh()
+        for c in ("Date", "Job", "Cost", "Price", "Profit"): self.hist_tree.heading(c, text=c + ((" ▼" if q.descending else " ▲") if c == q.sort else ""))
+        self.hist_view.set_count(count)
+        self.lbl_hist_count.config(text=f"{count:,} of {len(self.history):,} jobs")
 
     def show_queue(self): 
-        self.current_page_method = self.show_queue; self.clear_content(); self.build_queue_tab_internal()
+        self.current_page_method = self.show_queue; self.show_page("queue", self.build_queue_tab_internal, self.refresh_queue_list)
 
-    def build_queue_tab_internal(self):
-        ttk.Label(self.content_area, text="Job Queue", font=("Segoe UI", 20, "bold")).pack(pady=10)
-        cols = ("Job", "Date"); self.queue_tree = ttk.Treeview(self.content_area, columns=cols, show="headings"); self.queue_tree.pack(fill="both", expand=True)
+    def build_queue_tab_internal(self, page):
+        ttk.Label(page, text="Job Queue", font=("Segoe UI", 20, "bold")).pack(pady=10)
+        cols = ("Job", "Date"); self.queue_tree = ttk.Treeview(page, columns=cols, show="headings"); self.queue_tree.pack(fill="both", expand=True)
         for c in cols: self.queue_tree.heading(c, text=c)
-        for q in self.queue: self.queue_tree.insert("", "end", values=(q.get('job'), q.get('date_added')))
-        action_frame = ttk.Frame(self.content_area, padding=10); action_frame.pack(fill="x")
+        self.queue_rows = TreeBinding(self.queue_tree, lambda q: q['id'], lambda q: (q.get('job'), q.get('date_added')))
+        self.refresh_queue_list()
+        action_frame = ttk.Frame(page, padding=10); action_frame.pack(fill="x")
         ttk.Button(action_frame, text="✏️ Edit", style="Secondary.TButton", command=self.edit_queue_job).pack(side="left", padx=5)
         ttk.Button(action_frame, text="🔄 Load", style="Primary.TButton", command=self.load_queue_to_calculator).pack(side="left", padx=5)
         ttk.Button(action_frame, text="❌ Delete", style="Danger.TButton", command=self.delete_queue_job).pack(side="right", padx=5)
-        self.queue_menu = Menu(self.content_area, tearoff=0); self.queue_menu.add_command(label="Load", command=self.load_queue_to_calculator); self.queue_menu.add_command(label="Delete", command=self.delete_queue_job)
+        self.queue_menu = Menu(page, tearoff=0); self.queue_menu.add_command(label="Load", command=self.load_queue_to_calculator); self.queue_menu.add_command(label="Delete", command=self.delete_queue_job)
         self.queue_tree.bind("<Button-3>", self.show_queue_context_menu)
 
+    def refresh_queue_list(self):
+        self.queue_rows.sync(self.queue)
+
     def show_queue_context_menu(self, event):
         try: self.queue_tree.selection_set(self.queue_tree.identify_row(event.y)); self.queue_menu.tk_popup(event.x_root, event.y_root)
         finally: self.queue_menu.grab_release()
@@ -979,15 +3285,21 @@ class FilamentManagerApp:
         sel = self.queue_tree.selection()
         if not sel: return
         idx = self.queue_tree.index(sel[0]); job = self.queue[idx]; new_name = simpledialog.askstring("Edit", "Name:", initialvalue=job.get('job'))
-        if new_name: self.queue[idx]['job'] = new_name; self.save_json(self.queue, QUEUE_FILE); self.refresh_queue_list()
+        if new_name: job['job'] = new_name; self.store.save_queue(); self.queue_rows.put(job)
 
     def load_queue_to_calculator(self):
         sel = self.queue_tree.selection()
         if not sel: return
         job = self.queue[self.queue_tree.index(sel[0])]; self.show_calculator()
         self.entry_job_name.delete(0, tk.END); self.entry_job_name.insert(0, job.get('job', '')); self.clear_job()
-        if 'items' in job: self.current_job_filaments = job['items']; 
-        for item in self.current_job_filaments: self.list_job.insert(tk.END, f"{item['spool']['name']}: {item['grams']}g")
+        missing = []
+        for item in job.get('items', []):
+            sp = item.get('spool'); sid = sp.id if isinstance(sp, Spool) else normalize_spool_id((sp or {}).get('id', ''))
+            spool = self.inventory.get(sid) # Re-resolved: the spool may have been deleted or replaced since it was queued
+            if spool: self.current_job_filaments.append(dict(item, spool=spool))
+            else: missing.append(sid or "?")
+        if missing: messagebox.showwarning("Queue", f"Spools no longer in inventory were left out: {', '.join(missing)}")
+        for item in self.current_job_filaments: self.list_job.insert(tk.END, f"{item['spool'].name}: {item['grams']}g")
         if 'params' in job:
             p = job['params']; self.entry_hours.delete(0, tk.END); self.entry_hours.insert(0, str(p.get('hours', 0)))
             self.entry_swaps.delete(0, tk.END); self.entry_swaps.insert(0, str(p.get('swaps', 0)))
@@ -996,78 +3308,187 @@ class FilamentManagerApp:
     def delete_queue_job(self):
         sel = self.queue_tree.selection()
         if not sel: return
-        if messagebox.askyesno("Delete", "Remove?"): self.queue.pop(self.queue_tree.index(sel[0])); self.save_json(self.queue, QUEUE_FILE); self.refresh_queue_list()
+        if messagebox.askyesno("Delete", "Remove?"): job = self.queue.pop(self.queue_tree.index(sel[0])); self.store.save_queue(); self.queue_rows.remove(job['id'])
 
     def show_maintenance(self): 
-        self.current_page_method = self.show_maintenance; self.clear_content(); ttk.Label(self.content_area, text="Maintenance", font=("Segoe UI", 20, "bold")).pack(pady=10)
-        self.build_maintenance_tab_internal()
+        self.current_page_method = self.show_maintenance; self.show_page("maintenance", self.build_maintenance_tab_internal, self.refresh_maintenance_list)
 
-    def build_maintenance_tab_internal(self):
-        cols = ("Task", "Freq", "Last Done"); self.maint_tree = ttk.Treeview(self.content_area, columns=cols, show="headings"); self.maint_tree.pack(fill="both", expand=True)
+    def build_maintenance_tab_internal(self, page):
+        ttk.Label(page, text="Maintenance", font=("Segoe UI", 20, "bold")).pack(pady=10)
+        cols = ("Task", "Freq", "Last Done"); self.maint_tree = ttk.Treeview(page, columns=cols, show="headings"); self.maint_tree.pack(fill="both", expand=True)
         for c in cols: self.maint_tree.heading(c, text=c)
-        ttk.Button(self.content_area, text="✅ Mark Done", command=self.perform_maintenance, style="Success.TButton").pack(pady=10)
+        ttk.Button(page, text="✅ Mark Done", command=self.perform_maintenance, style="Success.TButton").pack(pady=10)
+        self.maint_rows = TreeBinding(self.maint_tree, lambda m: m['task'], lambda m: (m['task'], m.get('freq', 'Monthly'), m['last']))
         self.refresh_maintenance_list()
 
     def refresh_maintenance_list(self):
-        for i in self.maint_tree.get_children(): self.maint_tree.delete(i)
-        for item in self.maintenance: self.maint_tree.insert("", "end", values=(item['task'], item.get('freq', 'Monthly'), item['last']))
+        self.maint_rows.sync(self.maintenance)
 
     def perform_maintenance(self):
         sel = self.maint_tree.selection()
         if not sel: return
         val = self.maint_tree.item(sel[0])['values']; task_name = val[0]
         for item in self.maintenance:
-            if item['task'] == task_name: item['last'] = datetime.now().strftime("%Y-%m-%d"); break
-        self.save_json(self.maintenance, MAINT_FILE); self.refresh_maintenance_list()
+            if item['task'] == task_name: item['last'] = datetime.now().strftime("%Y-%m-%d"); self.store.update_maintenance(item); self.maint_rows.put(item); break
 
     def load_all_data(self):
-        self.inventory = self.load_json(DB_FILE); self.history = self.load_json(HISTORY_FILE)
-        self.maintenance = self.load_json(MAINT_FILE); self.queue = self.load_json(QUEUE_FILE)
-        # Ensure IDs exist
-        next_id = 1
-        for item in self.inventory:
-            if 'id' in item and str(item['id']).isdigit(): val = int(item['id']); 
-            if val >= next_id: next_id = val + 1
-        for item in self.inventory:
-            if 'id' not in item: item['id'] = str(next_id).zfill(3); next_id += 1
+        WRITER.flush() # Pending writes must land before re-reading from disk
+        sig = stat_signature(self.store.source_files())
+        cached = self.snapshot_cache.load(self.store.backend, sig)
+        if cached: self.inventory, self.history, self.maintenance, self.queue, self.rollups = cached
+        else:
+            inventory, history, self.maintenance, self.queue = self.store.load()
+            # Parse & validate once; everything downstream works on typed records
+            self.data_warnings = []
+            spools = [Spool.from_dict(d, self.data_warnings) for d in inventory]
+            self.history = [HistoryEntry.from_dict(d, self.data_warnings) for d in history]
+            for w in self.data_warnings: print(f"[data] {w}", file=sys.stderr)
+            # Ensure IDs exist and are unique (they key tree rows and the search index)
+            next_id = 1; seen = set()
+            for item in spools:
+                if item.id.isdigit(): next_id = max(next_id, int(item.id) + 1)
+            for item in spools:
+                if not item.id or item.id in seen: item.id = str(next_id).zfill(3); next_id += 1
+                seen.add(item.id)
+            self.inventory = InventoryRepository(spools)
+            # Queued segments point at the live spool records so deductions hit the inventory;
+            # a spool deleted since stays a plain dict and is left out when the job is loaded
+            for job in self.queue:
+                job.setdefault('id', uuid.uuid4().hex[:12]) # Keys the queue rows; older queue files predate it
+                for item in job.get('items', []):
+                    sp = item.get('spool')
+                    if isinstance(sp, dict): item['spool'] = self.inventory.get(normalize_spool_id(sp.get('id', ''))) or sp
+            self.rollups = DashboardRollups.rebuild(self.inventory, self.history)
+            self.save_snapshot_cache(sig)
+        self.data_signature = sig
+        self.history_columns = None # Rebuilt lazily by the Reports page
+        self.search_index = SpoolSearchIndex(self.inventory)
+
+    def save_snapshot_cache(self, sig=None):
+        try: self.snapshot_cache.save(self.store.backend, sig or stat_signature(self.store.source_files()), (self.inventory, self.history, self.maintenance, self.queue, self.rollups))
+        except Exception: pass
+
+    def note_own_write(self, paths):
+        for p in [paths] if isinstance(paths, str) else paths:
+            if p in self.data_signature: self.data_signature[p] = file_stat(p)
+
+    def data_changed_on_disk(self):
+        return stat_signature(self.store.source_files()) != self.data_signature
     
     def load_json(self, f): 
         if os.path.exists(f): 
-            try: return json.load(open(f))
+            try:
+                with open(f, 'r', encoding='utf-8') as fh: return json.load(fh)
             except: return []
         return []
-    def save_json(self, d, f): json.dump(d, open(f,'w'), indent=4)
-    def perform_auto_backup(self): pass # Stub for brevity
+    def save_json(self, d, f):
+        # The container is copied here on the Tk thread; the writer encodes it later and must not see later appends/removes
+        snap = list(d) if isinstance(d, list) else dict(d); WRITER.mark_dirty(f, lambda: snap)
+    def check_write_errors(self):
+        errors = WRITER.take_errors()
+        if errors: messagebox.showerror("Save Failed", f"Could not save:\n{self.describe_write_errors(errors)}\n\nYour changes are kept and saving is retried in the background.")
+        self.root.after(1000, self.check_write_errors)
+    def describe_write_errors(self, errors): return "\n".join(f"{os.path.basename(p)}: {e}" for p, e in errors.items())
+    def on_close(self):
+        failed = WRITER.flush(); WRITER.take_errors()
+        if failed:
+            ans = messagebox.askyesnocancel("Save Failed", f"Could not save:\n{self.describe_write_errors(failed)}\n\nYes: try again\nNo: quit and lose these changes\nCancel: keep the app open")
+            if ans is None: return
+            if ans: return self.on_close()
+        changed = self.data_changed_on_disk()
+        self.store.close(); self.history_journal.close()
+        if not changed and not failed: self.save_snapshot_cache() # Never cache data that didn't reach disk
+        self.fleet.stop(); self.telemetry.close(); TASKS.shutdown(); self.root.destroy()
+    def perform_auto_backup(self):
+        retention = dict(DEFAULT_BACKUP_RETENTION, **CONFIG.section('backup_retention'))
+        TASKS.submit(self.backup_manager.run, retention, key="backup", on_error=lambda e: messagebox.showwarning("Backup", f"Automatic backup failed: {e}"))
+
+    def restore_backup(self, parent=None):
+        snaps = self.backup_manager.snapshots()
+        if not snaps: messagebox.showinfo("Backups", "No backups yet."); return
+        d = tk.Toplevel(parent or self.root); d.title("Restore Backup")
+        ttk.Label(d, text="Select snapshot:", padding=10).pack()
+        box = ttk.Combobox(d, values=snaps[::-1], state="readonly"); box.pack(padx=20, pady=10); box.current(0)
+        def confirm():
+            name = box.get()
+            if not messagebox.askyesno("Restore", f"Replace current data with backup {name}?", parent=d): return
+            WRITER.flush(); self.store.close(); self.history_journal.close()
+            try: count = self.backup_manager.restore(name)
+            except Exception as e: messagebox.showerror("Error", str(e), parent=d); return
+            finally:
+                # Reopened even after a failed restore: the app must never keep running on a closed store
+                CONFIG.data = None; self.defaults = self.load_sticky_settings(); self.printer_cfg = self.load_printer_config(); self.start_printer_listener()
+                self.history_journal = HistoryJournal(HISTORY_FILE, HISTORY_JOURNAL_DIR); self.history_journal.open()
+                self.store = open_store(self.history_journal); self.store.attach(self); self.store.on_written = self.note_own_write
+                self.load_all_data(); self.current_page_method()
+            d.destroy(); messagebox.showinfo("Restored", f"Restored {count} file(s) from {name}.")
+        def export():
+            name = box.get(); path = filedialog.asksaveasfilename(parent=d, defaultextension=".zip", initialfile=f"backup_{name}.zip", filetypes=[("ZIP", "*.zip")])
+            if not path: return
+            TASKS.submit(self.backup_manager.export_zip, name, path, key=("backup_export", path),
+                         on_done=lambda _: messagebox.showinfo("Backups", f"Exported {name} to {path}"), on_error=lambda e: messagebox.showerror("Error", str(e)))
+        btns = ttk.Frame(d); btns.pack(pady=10)
+        ttk.Button(btns, text="Restore", style='Danger.TButton', command=confirm).pack(side="left", padx=5)
+        ttk.Button(btns, text="Export ZIP...", command=export).pack(side="left", padx=5)
     # --- ADDED MISSING LOAD_CONFIG HELPER IN MAIN APP ---
-    def load_config(self):
-        if os.path.exists(CONFIG_FILE): return json.load(open(CONFIG_FILE))
-        return {}
+    def load_config(self): return CONFIG.snapshot()
         
-    def load_sticky_settings(self):
-        if os.path.exists(CONFIG_FILE): return json.load(open(CONFIG_FILE)).get('sticky_settings', {})
-        return {}
+    def load_sticky_settings(self): return CONFIG.sticky_settings
     def save_sticky_settings(self):
-        d = self.load_config(); d['sticky_settings'] = {"markup": self.entry_markup.get(), "labor": self.entry_processing.get(), "rate": self.entry_mach_rate.get(), "swap_fee": self.entry_swap_fee.get()}
-        json.dump(d, open(CONFIG_FILE, 'w'))
-    def load_printer_config(self): 
-        if os.path.exists(CONFIG_FILE): return json.load(open(CONFIG_FILE)).get('printer_cfg', {})
-        return {}
-    def save_printer_config(self, ip, ac, sn, en, mode, token):
-        d = self.load_config(); d['printer_cfg'] = {"ip":ip, "access_code":ac, "serial":sn, "enabled":en, "mode":mode, "token":token}; json.dump(d, open(CONFIG_FILE,'w'))
-        self.printer_cfg = d['printer_cfg']
+        # No-op (and no disk I/O) unless a sticky value actually changed
+        sticky = {"markup": self.entry_markup.get(), "labor": self.entry_processing.get(), "rate": self.entry_mach_rate.get(), "swap_fee": self.entry_swap_fee.get()}
+        if CONFIG.set('sticky_settings', sticky): self.defaults = sticky
+    def load_printer_config(self): return CONFIG.printer_cfg
+    def save_printer_config(self, printers, en=True):
+        CONFIG.set('printers', printers); CONFIG.set('printer_cfg', dict(self.printer_cfg, enabled=en))
+        self.printer_cfg = CONFIG.printer_cfg
     def start_printer_listener(self, override_token=None):
-        if self.printer_client: self.printer_client.disconnect()
-        if self.printer_cfg.get('access_code'): self.printer_client = BambuPrinterClient(self.printer_cfg.get('ip'), "bblp", self.printer_cfg.get('access_code'), self.printer_cfg.get('serial'), self.on_printer_status_update, None); self.printer_client.connect()
-    def on_printer_status_update(self, data): self.root.after(0, lambda: self._update_ui_safe(data))
-    def _update_ui_safe(self, data):
-        if hasattr(self, 'lbl_printer_status') and self.lbl_printer_status.winfo_exists(): self.lbl_printer_status.config(text=f"Online: {data.get('gcode_state', 'IDLE')}", foreground=self.ACCENT_COLOR)
+        # Safe to call repeatedly: the hub only reconnects printers whose settings changed
+        self.fleet.configure(CONFIG.printers if self.printer_cfg.get('enabled') else [])
+    def show_fleet_diagnostics(self):
+        top = getattr(self, 'fleet_diag', None)
+        if top is not None and top.winfo_exists(): top.lift(); return
+        top = self.fleet_diag = tk.Toplevel(self.root); top.title("Fleet Diagnostics"); top.geometry("1100x360")
+        cols = ("Printer", "Link", "State", "Poll Mode", "Interval", "Next Poll", "Last Report", "Reports", "Pushalls", "Deferred", "Reconnects")
+        tree = ttk.Treeview(top, columns=cols, show="headings")
+        for c in cols: tree.heading(c, text=c); tree.column(c, anchor="center", width=85)
+        tree.column("Printer", width=140, anchor="w"); tree.column("Poll Mode", width=190, anchor="w")
+        tree.pack(fill="both", expand=True, padx=10, pady=10)
+        lbl = ttk.Label(top, text="", foreground=self.TEXT_SECONDARY); lbl.pack(anchor="w", padx=10, pady=(0, 10))
+        secs = lambda v: "-" if v is None else f"{max(0.0, v):.0f}s"
+        rows = TreeBinding(tree, lambda r: r[0], lambda r: (r[1]['name'], r[1]['link'], r[1]['gcode_state'], r[1]['reason'], f"{r[1]['interval']:g}s",
+                                                                secs(r[1]['next_poll']), secs(r[1]['last_report']) + (" ago" if r[1]['last_report'] is not None else ""),
+                                                                f"{r[1]['reports']:,}", f"{r[1]['pushalls']:,}", f"{r[1]['deferred']:,}", f"{r[1]['reconnects']:,}"))
+        def refresh():
+            if not top.winfo_exists(): return
+            rows.sync(sorted(self.fleet.diagnostics().items(), key=lambda r: r[1]['name'].lower()))
+            st = self.fleet.stats
+            lbl.config(text=f"Telemetry: {st['updates']:,} updates · {st['merged']:,} merged · {st['unchanged']:,} unchanged · {st['delivered']:,} delivered to UI at ≤{1000 / self.fleet_interval:g} fps")
+            top.after(1000, refresh)
+        refresh()
+
+    def fleet_tick(self):
+        # The only path from telemetry to Tk: whatever merged since the last tick, applied cell by cell.
+        # Off the dashboard the changes are just consumed; showing it re-syncs from the state table.
+        changes = self.fleet.take_changes()
+        if changes and self.current_page is self.pages.get("dashboard") and self.fleet_rows and self.fleet_rows.alive:
+            for serial, (state, fields) in changes.items():
+                if state is None: self.fleet_rows.remove(serial)
+                else: self.fleet_rows.patch((serial, state))
+            self.update_fleet_summary(self.fleet.states())
+            self.update_sparklines()
+            st = self.fleet.stats
+            self.lbl_fleet_stats.config(text=f"{st['updates']:,} updates · {st['merged']:,} merged · {st['unchanged']:,} unchanged")
+        self.root.after(self.fleet_interval, self.fleet_tick)
     
     # --- RESTORED PROFILE SCANNER & INSPECTOR ---
     def scan_for_custom_profiles(self):
-        custom_rows = []
+        # Runs on a task worker; reports per directory and stops early if cancelled
+        custom_rows = []; task = current_task()
         scan_dirs = [get_base_path(), os.path.join(get_base_path(), "profiles")]
-        for d in scan_dirs:
+        for i, d in enumerate(scan_dirs):
             if not os.path.exists(d): continue
+            if task: task.progress(i / len(scan_dirs), f"Scanning {os.path.basename(d) or d}...")
             for file in os.listdir(d):
                 if file.endswith(".json") and file not in ["filament_inventory.json", "sales_history.json", "maintenance_log.json", "job_queue.json", "config.json"]:
                     try:
@@ -1098,13 +3519,19 @@ class FilamentManagerApp:
 
     def build_wiki_tabs(self): 
         f_comp = ttk.Frame(self.gallery_notebook); self.gallery_notebook.add(f_comp, text=" 📂 My Profiles ")
-        ttk.Label(f_comp, text="(Double-click to inspect)", font=("Segoe UI", 8), foreground="gray").pack(pady=5)
+        hint = ttk.Label(f_comp, text="⏳ Scanning profiles...", font=("Segoe UI", 8), foreground="gray"); hint.pack(pady=5)
         self.fil_tree = ttk.Treeview(f_comp, columns=("Name", "Path"), show="headings")
         self.fil_tree.heading("Name", text="Profile Name"); self.fil_tree.heading("Path", text="Location")
         self.fil_tree.pack(fill="both", expand=True)
         self.fil_tree.bind("<Double-1>", self.on_guide_double_click)
-        data = self.scan_for_custom_profiles()
-        for row in data: self.fil_tree.insert("", "end", values=row)
+        def done(rows):
+            if not self.fil_tree.winfo_exists(): return
+            for row in rows: self.fil_tree.insert("", "end", values=row)
+            hint.config(text="(Double-click to inspect)")
+        def progress(value, text):
+            if hint.winfo_exists(): hint.config(text=f"⏳ {text}")
+        TASKS.submit(self.scan_for_custom_profiles, key="profile_scan", on_done=done, on_progress=progress, timeout=60,
+                     on_error=lambda e: hint.config(text=f"⚠️ Profile scan failed: {e}") if hint.winfo_exists() else None)
 
     def build_manual_tab(self):
         f = ttk.Frame(self.gallery_notebook); self.gallery_notebook.add(f, text=" 📖 Manual ")
@@ -1129,6 +3556,14 @@ class FilamentManagerApp:
             self.txt_info.insert("1.0", self.materials_data[topic])
 
 if __name__ == "__main__":
+    if "--migrate-sqlite" in sys.argv:
+        counts = migrate_json_to_sqlite()
+        print(f"Migrated to {SQLITE_FILE}: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+        sys.exit(0)
     app = ttk.Window(themename="litera") 
+    STARTUP.mark("create root window")
     FilamentManagerApp(app)
+    def first_paint():
+        app.update_idletasks(); STARTUP.mark("first window paint"); STARTUP.report()
+    if STARTUP.enabled: app.after_idle(first_paint)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import glob
+import time
+
+# Throughput of the printer report parser over recorded payloads, in messages per CPU-second
+# (i.e. per core; the parser runs on the single fleet network thread).
+#   python tools/bench_report_parser.py [seconds_per_case]
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(HERE, "fixtures", "bambu_reports")
+sys.path.insert(0, os.path.dirname(HERE))
+
+from print_manager import ReportParser, HAS_ORJSON
+
+# Roughly what one printer sends between two pushalls while printing
+MIX = ["pushall_p1s.json"] + ["delta_progress.json", "delta_temps.json"] * 4 + ["delta_ams.json", "delta_idle.json", "info_version.json"]
+# Live readings nudged per copy so consecutive reports differ the way real ones do; otherwise the warm
+# parser would skip every key and measure only the decode
+VARY = {"mc_percent": 1, "mc_remaining_time": -1, "layer_num": 1, "nozzle_temper": 0.0625, "bed_temper": 0.03125, "chamber_temper": 1}
+VARIANTS = 16
+
+def legacy_parse(raw):
+    # The old on_message: decode + full json.loads + copy six keys
+    payload = json.loads(raw.decode())
+    p = payload.get('print', payload)
+    return {k: p[k] for k in ("gcode_state", "mc_percent", "mc_remaining_time", "nozzle_temper", "bed_temper", "subtask_name") if k in p}
+
+def load_fixtures():
+    out = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(path, 'rb') as f: out[os.path.basename(path)] = f.read()
+    return out
+
+def vary(raw, n=VARIANTS):
+    payload = json.loads(raw); p = payload.get("print")
+    if not isinstance(p, dict) or not VARY.keys() & p.keys(): return [raw]
+    out = []
+    for i in range(n):
+        q = dict(p)
+        for k, step in VARY.items():
+            if isinstance(q.get(k), (int, float)): q[k] += step * i
+        out.append(json.dumps(dict(payload, print=q), separators=(",", ":")).encode())
+    return out
+
+def measure(fn, payloads, seconds):
+    # Returns messages per CPU-second
+    n = 0; start = time.process_time(); deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for raw in payloads: fn(raw)
+        n += len(payloads)
+    return n / max(time.process_time() - start, 1e-9)
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    fixtures = load_fixtures()
+    if not fixtures: print(f"No fixtures in {FIXTURES_DIR}"); return 1
+    parser = ReportParser()
+    def cold(raw):
+        parser.reset(); parser.parse(raw) # Every field treated as new (first report after a connect)
+    def warm(raw): parser.parse(raw) # Steady state: only the readings that changed since the last report are converted
+    varied = {name: vary(raw) for name, raw in fixtures.items()}
+    cases = list(varied.items())
+    mix = [n for n in MIX if n in varied] * VARIANTS
+    cases.append(("mix (1 pushall : 11 other)", [varied[n][i % len(varied[n])] for i, n in enumerate(mix)]))
+    print(f"JSON decoder: {'orjson' if HAS_ORJSON else 'json'}")
+    print(f"{'Case':<30}{'Bytes':>8}{'Legacy msg/s':>15}{'Cold msg/s':>15}{'Warm msg/s':>15}{'Warm speedup':>14}")
+    for name, payloads in cases:
+        size = sum(len(p) for p in payloads) // len(payloads)
+        old = measure(legacy_parse, payloads, seconds); c = measure(cold, payloads, seconds); w = measure(warm, payloads, seconds)
+        print(f"{name:<30}{size:>8}{old:>15,.0f}{c:>15,.0f}{w:>15,.0f}{w / old:>13.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())